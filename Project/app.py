@@ -4,6 +4,16 @@ from flask_migrate import Migrate
 from config import config
 from models import db, User
 from routes import init_routes
+from commands import init_commands
+from utils.cache import init_cache
+from utils.sales_aggregate import init_sales_aggregate
+from utils.fulltext import init_fulltext
+from utils.report_jobs import init_report_jobs
+from utils.database import engine_options, init_engine_profile
+from utils.replica import init_replica
+from utils.principals import init_principal_cache, load_principal
+from utils.passwords import init_password_hasher
+from utils.metrics import init_metrics
 import os
 
 def create_app(config_name='default'):
@@ -11,8 +21,11 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
-    # 初始化扩展
+    # 初始化扩展(引擎参数需在 init_app 之前设置)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    init_engine_profile(app)
+    init_replica(app)
     migrate = Migrate(app, db)
     
     # 初始化登录管理器
@@ -21,12 +34,26 @@ def create_app(config_name='default'):
     login_manager.login_view = 'login'
     login_manager.login_message = '请先登录'
     
+    # 已登录请求从进程内缓存取用户身份，不必每次查询数据库
+    init_principal_cache(app)
+    init_password_hasher(app)
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_principal(user_id)
+    
+    # 初始化全文索引、数据缓存和后台报表任务
+    init_fulltext(app)
+    init_cache(app)
+    init_sales_aggregate(app)
+    init_report_jobs(app)
+    
+    # 请求耗时、SQL、模板渲染指标及慢查询日志
+    init_metrics(app)
     
     # 初始化路由
     init_routes(app)
+    init_commands(app)
     
     # 创建必要的目录
     os.makedirs('static/uploads', exist_ok=True)
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def create_benchmark_app(db_path=None):
+    """创建使用临时SQLite数据库的应用，必须在导入 config 之前调用"""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix='medical_bench_'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from app import create_app
+    app = create_app()
+    app.config['LOGIN_DISABLED'] = True
+    return app, db_path
+
+
+@contextmanager
+def timer(label, results=None):
+    """打印并记录代码块耗时(毫秒)"""
+    start = time.perf_counter()
+    yield
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'{label:<40} {elapsed:>10.2f} ms')
+    if results is not None:
+        results[label] = elapsed
+
+
+def best_of(func, repeat=5):
+    """重复执行 func，返回 (最短耗时毫秒, 最后一次结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,136 @@
+"""
+SQLite并发读写基准测试：默认回滚日志 vs WAL引擎配置(Config.SQLITE_PRAGMAS)
+
+读线程执行看板类统计查询，写线程逐条新增预约并扣减库存(每次一个事务)，
+两种模式使用同样的锁等待时间，分别统计读写吞吐量、p95延迟和 database is locked 错误数。
+
+用法: python -m benchmarks.db_concurrency --readers 8 --writers 2 --seconds 5
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import Config
+from models import db
+from utils.database import engine_options, apply_sqlite_pragmas
+
+READ_SQL = text(
+    "SELECT doctor_id, COUNT(*) FROM appointments "
+    "WHERE date >= :start AND date < :end GROUP BY doctor_id"
+)
+INSERT_SQL = text(
+    "INSERT INTO appointments (patient_id, doctor_id, date, status) "
+    "VALUES (:patient_id, :doctor_id, :date, 'scheduled')"
+)
+STOCK_SQL = text("UPDATE medicines SET stock = stock - 1 WHERE id = :id")
+
+
+def create_engine_for(mode, rows):
+    """新建数据库文件(日志模式会持久化在文件中)并写入初始数据"""
+    path = os.path.join(tempfile.mkdtemp(prefix='medical_bench_'), f'{mode}.db')
+    pragmas = dict(Config.SQLITE_PRAGMAS) if mode == 'wal' else \
+        {'busy_timeout': Config.SQLITE_PRAGMAS['busy_timeout']}
+    config = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'SQLITE_PRAGMAS': pragmas}
+    engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], pool_size=32, **engine_options(config))
+    apply_sqlite_pragmas(engine, pragmas)
+
+    db.metadata.create_all(engine)
+    now = datetime(2026, 1, 1)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'INSERT INTO patients (name, contact, age, gender) VALUES (?, ?, 30, ?)',
+            [(f'患者{i}', f'138{i:08d}', '男') for i in range(1000)])
+        connection.exec_driver_sql(
+            "INSERT INTO doctors (name, department, title, available) VALUES (?, '内科', '主治医师', 1)",
+            [(f'医生{i}',) for i in range(40)])
+        connection.exec_driver_sql(
+            "INSERT INTO medicines (name, price, stock, category) VALUES ('药品', 10, 100000000, '处方药')")
+        connection.exec_driver_sql(
+            "INSERT INTO appointments (patient_id, doctor_id, date, status) VALUES (?, ?, ?, 'completed')",
+            [(1 + i % 1000, 1 + i % 40, now + timedelta(minutes=i)) for i in range(rows)])
+    return engine
+
+
+def run(engine, readers, writers, seconds):
+    stats = {'read': [], 'write': [], 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    start = datetime(2026, 1, 1)
+
+    def read_loop(index):
+        latencies = []
+        while time.perf_counter() < deadline:
+            day = start + timedelta(days=index % 30)
+            begin = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(READ_SQL, {'start': day, 'end': day + timedelta(days=7)}).all()
+            except OperationalError:
+                with lock:
+                    stats['locked'] += 1
+                continue
+            latencies.append(time.perf_counter() - begin)
+        with lock:
+            stats['read'].extend(latencies)
+
+    def write_loop(index):
+        latencies = []
+        count = 0
+        while time.perf_counter() < deadline:
+            count += 1
+            begin = time.perf_counter()
+            try:
+                with engine.begin() as connection:
+                    connection.execute(INSERT_SQL, {
+                        'patient_id': 1 + count % 1000,
+                        'doctor_id': 1 + index % 40,
+                        'date': start + timedelta(minutes=count),
+                    })
+                    connection.execute(STOCK_SQL, {'id': 1})
+            except OperationalError:
+                with lock:
+                    stats['locked'] += 1
+                continue
+            latencies.append(time.perf_counter() - begin)
+        with lock:
+            stats['write'].extend(latencies)
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def p95(latencies):
+    if not latencies:
+        return 0
+    return sorted(latencies)[int(len(latencies) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=50000, help='初始预约数')
+    args = parser.parse_args()
+
+    print(f'{"模式":<12}{"读/秒":>10}{"读p95(ms)":>12}{"写/秒":>10}{"写p95(ms)":>12}{"锁错误":>8}')
+    for mode, label in (('default', '回滚日志'), ('wal', 'WAL')):
+        engine = create_engine_for(mode, args.rows)
+        stats = run(engine, args.readers, args.writers, args.seconds)
+        engine.dispose()
+        print(f'{label:<12}{len(stats["read"]) / args.seconds:>10.0f}{p95(stats["read"]):>12.2f}'
+              f'{len(stats["write"]) / args.seconds:>10.0f}{p95(stats["write"]):>12.2f}{stats["locked"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+应用冷启动基准测试：用 python -X importtime 统计 create_app() 的导入耗时
+
+pandas、plotly、diagrams 等可选依赖只在对应路由被访问时导入，
+create_app() 之后其中任一模块出现在 sys.modules 中即以退出码1结束，可作为回归检查。
+耗时随机器和磁盘缓存波动较大，只作报告，不参与判定。
+
+用法: python -m benchmarks.import_time
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动时不应加载的重量级可选依赖
+LAZY_MODULES = ['pandas', 'numpy', 'plotly', 'diagrams', 'matplotlib', 'openpyxl', 'pyarrow']
+
+STARTUP_CODE = '''
+import sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = (time.perf_counter() - start) * 1000
+print(f'{elapsed:.2f}')
+print(','.join(m for m in %r if m in sys.modules))
+''' % (LAZY_MODULES,)
+
+
+def measure():
+    """在新进程中启动应用，返回 (总耗时毫秒, 提前导入的模块, 各模块的累计导入耗时)"""
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'import_time_bench.db')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    elapsed, loaded = result.stdout.splitlines()[-2:]
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 缩进反映导入层级(每层2个空格)，统计 app 及其直接导入的模块
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            modules[name.strip()] = int(cumulative) / 1000
+    return float(elapsed), [m for m in loaded.split(',') if m], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    # 第一次运行含磁盘读取和字节码编译，取多次中的最短耗时
+    runs = [measure() for _ in range(args.repeat)]
+    elapsed, loaded, modules = min(runs, key=lambda run: run[0])
+
+    print(f'{"模块":<40}{"累计导入(ms)":>14}')
+    for name, ms in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f'{name:<40}{ms:>14.2f}')
+    print(f'\ncreate_app() 总耗时: {elapsed:.2f} ms')
+
+    if loaded:
+        print(f'启动时提前导入了可选依赖: {", ".join(loaded)}')
+        sys.exit(1)
+    print('未提前导入可选依赖')
+
+
+if __name__ == '__main__':
+    main()
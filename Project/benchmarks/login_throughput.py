@@ -0,0 +1,91 @@
+"""
+登录吞吐量基准测试：模拟交接班时大量员工同时登录，比较不同哈希方法和校验线程数下
+每秒完成的登录数、延迟以及被限流(503)的请求数
+
+每个方法先用旧参数(pbkdf2:sha256:50000，比各方法都弱)存储密码，第一轮登录时自动重新哈希，
+第二轮即为新参数下的稳定吞吐量。
+
+用法: python -m benchmarks.login_throughput --logins 200 --concurrency 32 --workers 2,4
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import create_benchmark_app
+
+LEGACY_METHOD = 'pbkdf2:sha256:50000'
+METHODS = ['scrypt:32768:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:100000']
+PASSWORD = 'shift-change-123'
+
+
+def populate(db, User, hasher, users):
+    # 所有用户密码相同，只计算一次哈希
+    password_hash = hasher.hash(PASSWORD)
+    db.session.execute(User.__table__.delete())
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'staff{i}', 'email': f'staff{i}@medical.com', 'password_hash': password_hash, 'role': 'staff'}
+        for i in range(users)
+    ])
+    db.session.commit()
+
+
+def run_logins(app, logins, users, concurrency):
+    """并发登录，返回 (耗时秒, 各次延迟毫秒, {状态码: 次数})"""
+    def login(i):
+        start = time.perf_counter()
+        response = app.test_client().post('/login', data={'username': f'staff{i % users}', 'password': PASSWORD})
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return elapsed, [latency for status, latency in results if status == 302], statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', default='2,4', help='密码校验线程数，逗号分隔')
+    parser.add_argument('--queue', type=int, default=16, help='校验排队上限')
+    parser.add_argument('--methods', default=','.join(METHODS))
+    args = parser.parse_args()
+
+    app, db_path = create_benchmark_app()
+    from models import db, User
+    from utils.passwords import init_password_hasher, get_hasher
+
+    with app.app_context():
+        db.create_all()
+
+    print(f'{"哈希方法":<24}{"线程":>6}{"轮次":>8}{"登录/秒":>10}{"P50(ms)":>10}{"P95(ms)":>10}{"503":>6}')
+    for method in args.methods.split(','):
+        for workers in (int(w) for w in args.workers.split(',')):
+            app.config.update(PASSWORD_HASH_METHOD=LEGACY_METHOD, PASSWORD_HASH_WORKERS=workers,
+                              PASSWORD_HASH_QUEUE=args.queue)
+            init_password_hasher(app)
+            with app.app_context():
+                populate(db, User, get_hasher(), args.users)
+
+            app.config['PASSWORD_HASH_METHOD'] = method
+            init_password_hasher(app)
+            for label in ('重新哈希', '稳定'):
+                elapsed, latencies, statuses = run_logins(app, args.logins, args.users, args.concurrency)
+                ok = statuses.get(302, 0)
+                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0
+                p50 = statistics.median(latencies) if latencies else 0
+                print(f'{method:<24}{workers:>6}{label:>8}{ok / elapsed:>10.1f}{p50:>10.1f}{p95:>10.1f}'
+                      f'{statuses.get(503, 0):>6}')
+
+    print(f'\n数据库文件: {db_path}')
+
+
+if __name__ == '__main__':
+    main()
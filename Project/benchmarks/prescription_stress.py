@@ -0,0 +1,101 @@
+"""
+开处方并发压力测试：多线程同时扣减同一药品库存，验证不会超卖并统计吞吐量
+
+用法: python -m benchmarks.prescription_stress --threads 16 --requests 200 --stock 1000
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from benchmarks.common import create_benchmark_app
+
+
+def seed(db, stock):
+    from models import Patient, Doctor, Appointment, Medicine
+    patient = Patient(name='压测患者', contact='13800000000', age=30, gender='男')
+    doctor = Doctor(name='压测医生', department='内科', title='主治医师')
+    medicine = Medicine(name='压测药品', price=10, stock=stock, category='处方药')
+    db.session.add_all([patient, doctor, medicine])
+    db.session.flush()
+    appointment = Appointment(patient_id=patient.id, doctor_id=doctor.id, date=datetime.now())
+    db.session.add(appointment)
+    db.session.commit()
+    return appointment.id, medicine.id
+
+
+def worker(app, appointment_id, medicine_id, count, outcome, lock):
+    client = app.test_client()
+    for _ in range(count):
+        quantity = random.randint(1, 5)
+        response = client.post('/prescriptions/add', json={
+            'appointment_id': appointment_id,
+            'medicine_id': medicine_id,
+            'quantity': quantity
+        })
+        result = response.get_json()
+        with lock:
+            if result['success']:
+                outcome['ok'] += 1
+                outcome['sold'] += quantity
+            elif result['message'] == '库存不足':
+                outcome['out_of_stock'] += 1
+            else:
+                outcome['errors'].append(result['message'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='每个线程的请求数')
+    parser.add_argument('--stock', type=int, default=1000)
+    args = parser.parse_args()
+
+    app, db_path = create_benchmark_app()
+    from models import db, Medicine, Prescription
+
+    with app.app_context():
+        db.create_all()
+        appointment_id, medicine_id = seed(db, args.stock)
+
+    outcome = {'ok': 0, 'sold': 0, 'out_of_stock': 0, 'errors': []}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(app, appointment_id, medicine_id, args.requests, outcome, lock))
+        for _ in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        final_stock = db.session.get(Medicine, medicine_id).stock
+        issued = db.session.query(db.func.coalesce(db.func.sum(Prescription.quantity), 0)).scalar()
+        prescriptions = Prescription.query.count()
+
+    total = args.threads * args.requests
+    print(f'请求总数: {total}  成功: {outcome["ok"]}  库存不足: {outcome["out_of_stock"]}  错误: {len(outcome["errors"])}')
+    print(f'初始库存: {args.stock}  剩余库存: {final_stock}  已开出数量: {issued}  处方数: {prescriptions}')
+    print(f'耗时: {elapsed:.2f}s  吞吐量: {total / elapsed:.1f} 请求/秒, {outcome["ok"] / elapsed:.1f} 处方/秒')
+    for message in sorted(set(outcome['errors']))[:5]:
+        print(f'  错误: {message}')
+
+    consistent = (
+        final_stock >= 0
+        and final_stock == args.stock - issued
+        and issued == outcome['sold']
+        and prescriptions == outcome['ok']
+    )
+    if not consistent:
+        print('失败: 库存与处方记录不一致(出现超卖或丢失更新)')
+        sys.exit(1)
+    print('通过: 未出现超卖')
+
+
+if __name__ == '__main__':
+    main()
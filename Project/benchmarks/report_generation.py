@@ -0,0 +1,121 @@
+"""
+报表数据准备基准测试：逐行构建DataFrame + pandas分组 vs pd.read_sql + 数据库GROUP BY
+
+只比较明细表和统计表的构建，Excel写出两种方式相同，加 --excel 时另测完整报表。
+
+用法: python -m benchmarks.report_generation --rows 100000
+      python -m benchmarks.report_generation --rows 1000000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+import pandas as pd
+from benchmarks.common import create_benchmark_app, timer, best_of
+
+DEPARTMENTS = ['内科', '外科', '儿科', '妇产科', '眼科', '口腔科', '皮肤科', '中医科']
+STATUSES = ['scheduled', 'completed', 'cancelled']
+
+
+def populate(db, rows):
+    """写入 rows 条预约，患者数为预约数的1/5，医生40名"""
+    random.seed(42)
+    connection = db.session.connection()
+    patients = max(1, rows // 5)
+    now = datetime(2026, 1, 1)
+    connection.exec_driver_sql(
+        'INSERT INTO doctors (name, department, title, available) VALUES (?, ?, ?, 1)',
+        [(f'医生{i}', DEPARTMENTS[i % len(DEPARTMENTS)], '主治医师') for i in range(40)])
+    for start in range(0, patients, 50000):
+        connection.exec_driver_sql(
+            'INSERT INTO patients (name, contact, age, gender, register_date) VALUES (?, ?, ?, ?, ?)',
+            [(f'患者{i}', f'138{i:08d}', random.randint(1, 99), random.choice('男女'), now - timedelta(days=i % 1000))
+             for i in range(start, min(start + 50000, patients))])
+    for start in range(0, rows, 50000):
+        connection.exec_driver_sql(
+            'INSERT INTO appointments (patient_id, doctor_id, date, status, notes) VALUES (?, ?, ?, ?, ?)',
+            [(random.randint(1, patients), random.randint(1, 40), now + timedelta(minutes=i * 10),
+              random.choice(STATUSES), None if i % 3 else '复诊')
+             for i in range(start, min(start + 50000, rows))])
+    db.session.commit()
+
+
+def legacy_appointment_frames(generator):
+    """原实现：query.all() 后逐行 strftime 构建字典，再用pandas分组"""
+    data = []
+    for result in generator._appointment_query().all():
+        data.append({
+            '预约ID': result.id,
+            '患者姓名': result.patient_name,
+            '医生姓名': result.doctor_name,
+            '科室': result.department,
+            '预约时间': result.date.strftime('%Y-%m-%d %H:%M'),
+            '状态': result.status,
+            '备注': result.notes or ''
+        })
+    df = pd.DataFrame(data)
+    dept_stats = df.groupby('科室').size().reset_index(name='预约数量')
+    status_stats = df.groupby('状态').size().reset_index(name='数量')
+    return df, dept_stats, status_stats
+
+
+def legacy_patient_frames(generator):
+    data = []
+    for result in generator._patient_query().all():
+        data.append({
+            '患者ID': result.id,
+            '姓名': result.name,
+            '年龄': result.age,
+            '性别': result.gender,
+            '注册日期': result.register_date.strftime('%Y-%m-%d'),
+            '预约次数': result.appointment_count
+        })
+    df = pd.DataFrame(data)
+    age_stats = df.groupby(pd.cut(df['年龄'], bins=[0, 18, 30, 50, 70, 100]), observed=False).size()
+    gender_stats = df.groupby('性别').size().reset_index(name='数量')
+    return df, age_stats, gender_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--excel', action='store_true', help='同时测量完整Excel报表生成')
+    args = parser.parse_args()
+
+    app, db_path = create_benchmark_app()
+    from models import db
+    from utils.reporting import ReportGenerator
+
+    with app.app_context():
+        db.create_all()
+        with timer(f'写入 {args.rows} 条预约'):
+            populate(db, args.rows)
+
+        generator = ReportGenerator(app.config['REPORTS_FOLDER'])
+        cases = [
+            ('预约报表', legacy_appointment_frames, generator._appointment_frames),
+            ('患者报表', legacy_patient_frames, generator._patient_frames),
+        ]
+        print(f'\n{"报表数据准备":<16}{"逐行(ms)":>12}{"向量化(ms)":>14}{"加速":>8}')
+        for label, legacy, vectorized in cases:
+            legacy_ms, (legacy_df, _, _) = best_of(lambda: legacy(generator), args.repeat)
+            new_ms, (new_df, _, _) = best_of(vectorized, args.repeat)
+            assert len(legacy_df) == len(new_df)
+            print(f'{label:<16}{legacy_ms:>12.2f}{new_ms:>14.2f}{legacy_ms / new_ms:>7.1f}x')
+
+        if args.excel:
+            print()
+            for streaming in (False, True):
+                generator = ReportGenerator(app.config['REPORTS_FOLDER'], streaming=streaming)
+                mode = '流式' if streaming else 'Pandas'
+                with timer(f'完整预约报表({mode})'):
+                    generator.generate_appointment_report()
+                with timer(f'完整患者报表({mode})'):
+                    generator.generate_patient_report()
+
+    print(f'\n数据库文件: {db_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+请求指标开销基准测试：比较关闭和开启 METRICS_ENABLED 时增删改查路由每个请求的平均耗时
+
+两个应用使用同一数据库，逐个请求交替发送，开销超过预算时以退出码1结束。
+
+用法: python -m benchmarks.request_overhead --requests 2000 --budget-pct 1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from benchmarks.common import create_benchmark_app
+
+ROUTES = [
+    ('GET', '/patients?per_page=20'),
+    ('GET', '/patients/page?per_page=20'),
+    ('GET', '/doctors/page?per_page=20'),
+    ('GET', '/medicines/page?per_page=20'),
+    ('GET', '/appointments/page?per_page=20'),
+    ('POST', '/patients/add'),
+    ('POST', '/patients/edit/1'),
+]
+
+
+def populate(db):
+    connection = db.session.connection()
+    connection.exec_driver_sql(
+        "INSERT INTO patients (name, contact, age, gender, address, register_date) VALUES (?, ?, 30, '男', '地址', datetime('now'))",
+        [(f'患者{i}', f'138{i:08d}') for i in range(5000)])
+    connection.exec_driver_sql(
+        "INSERT INTO doctors (name, department, title, available) VALUES (?, '内科', '主治医师', 1)",
+        [(f'医生{i}',) for i in range(50)])
+    connection.exec_driver_sql(
+        "INSERT INTO medicines (name, price, stock, category) VALUES (?, 10, 100, '处方药')",
+        [(f'药品{i}',) for i in range(500)])
+    connection.exec_driver_sql(
+        "INSERT INTO appointments (patient_id, doctor_id, date, status) VALUES (?, ?, datetime('now'), 'scheduled')",
+        [(1 + i % 5000, 1 + i % 50) for i in range(5000)])
+    db.session.commit()
+
+
+def create_apps():
+    """同一进程、同一数据库上创建关闭和开启请求指标的两个应用，交替测量以消除机器波动"""
+    os.environ['METRICS_ENABLED'] = 'false'
+    os.environ['SLOW_QUERY_LOG'] = os.path.join(tempfile.mkdtemp(prefix='metrics_bench_'), 'slow_queries.log')
+    app_off, db_path = create_benchmark_app()
+    from config import Config
+    from app import create_app
+    Config.METRICS_ENABLED = True
+    app_on = create_app()
+    app_on.config['LOGIN_DISABLED'] = True
+    return app_off, app_on, db_path
+
+
+def make_sender(client, method, url, payload):
+    if method == 'GET':
+        return lambda: client.get(url)
+    return lambda: client.post(url, json=payload)
+
+
+def interleaved(send_off, send_on, requests):
+    """逐个请求交替发送(先后顺序也交替)，返回两者的总耗时(毫秒)，机器负载波动对两边影响相同"""
+    totals = [0.0, 0.0]
+    for i in range(requests):
+        order = ((0, send_off), (1, send_on)) if i % 2 == 0 else ((1, send_on), (0, send_off))
+        for index, send in order:
+            start = time.perf_counter()
+            send()
+            totals[index] += time.perf_counter() - start
+    return totals[0] * 1000, totals[1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000, help='每个路由的请求数')
+    parser.add_argument('--budget-pct', type=float, default=1.0)
+    args = parser.parse_args()
+
+    app_off, app_on, db_path = create_apps()
+    from models import db
+    with app_off.app_context():
+        db.create_all()
+        populate(db)
+
+    payload = {'name': '患者', 'contact': '13800000000', 'age': 30, 'gender': '女'}
+    client_off, client_on = app_off.test_client(), app_on.test_client()
+    print(f'{"路由":<36}{"关闭(ms)":>10}{"开启(ms)":>10}{"开销":>9}')
+    total_off = total_on = 0.0
+    for method, url in ROUTES:
+        send_off = make_sender(client_off, method, url, payload)
+        send_on = make_sender(client_on, method, url, payload)
+        interleaved(send_off, send_on, 20)
+        off, on = interleaved(send_off, send_on, args.requests)
+        total_off, total_on = total_off + off, total_on + on
+        print(f'{method + " " + url:<36}{off / args.requests:>10.3f}{on / args.requests:>10.3f}{(on - off) / off:>9.2%}')
+    overhead = (total_on - total_off) / total_off * 100
+    print(f'\n总体开销 {overhead:.2f}% (预算 {args.budget_pct}%)')
+    print(f'数据库文件: {db_path}')
+    if overhead > args.budget_pct:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+空闲号源查询基准测试：在大量未来预约下查询医生/科室最早的空闲号源和预约冲突检查
+
+预约按医生排班(工作日 08:00-17:00，30分钟一个号源)从明天起依次写入，
+occupancy 控制号源占用比例，占用越高越需要向后查找。
+
+用法: python -m benchmarks.slot_search --rows 100000 --occupancy 0.9
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, time
+from benchmarks.common import create_benchmark_app, timer, best_of
+
+DEPARTMENTS = ['内科', '外科', '儿科', '妇产科', '眼科', '口腔科', '皮肤科', '中医科']
+DOCTORS = 40
+
+
+def populate(db, rows, occupancy):
+    random.seed(42)
+    connection = db.session.connection()
+    connection.exec_driver_sql(
+        'INSERT INTO patients (name, contact, age, gender) VALUES (?, ?, 30, ?)',
+        [(f'患者{i}', f'138{i:08d}', '男') for i in range(1000)])
+    connection.exec_driver_sql(
+        'INSERT INTO doctors (name, department, title, available, slot_minutes, work_start, work_end, work_days) '
+        "VALUES (?, ?, '主治医师', 1, 30, '08:00:00.000000', '17:00:00.000000', '12345')",
+        [(f'医生{i}', DEPARTMENTS[i % len(DEPARTMENTS)]) for i in range(DOCTORS)])
+
+    batch, day, written = [], datetime.now().date() + timedelta(days=1), 0
+    while written < rows:
+        if day.isoweekday() <= 5:
+            for doctor_id in range(1, DOCTORS + 1):
+                for slot in range(18):
+                    if random.random() < occupancy:
+                        start = datetime.combine(day, time(8)) + timedelta(minutes=30 * slot)
+                        batch.append((1 + written % 1000, doctor_id, start))
+                        written += 1
+        if len(batch) >= 50000 or written >= rows:
+            connection.exec_driver_sql(
+                "INSERT INTO appointments (patient_id, doctor_id, date, status) VALUES (?, ?, ?, 'scheduled')",
+                batch)
+            batch = []
+        day += timedelta(days=1)
+    db.session.commit()
+    return day
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--occupancy', type=float, default=0.9)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app, db_path = create_benchmark_app()
+    from models import db, Doctor
+    from utils.scheduling import next_free_slots, find_conflict
+
+    with app.app_context():
+        db.create_all()
+        with timer(f'写入 {args.rows} 条未来预约'):
+            last_day = populate(db, args.rows, args.occupancy)
+        print(f'预约排到 {last_day}\n')
+
+        doctor = db.session.get(Doctor, 1)
+        department = Doctor.query.filter_by(department='内科').all()
+        start = datetime.now()
+        probe = datetime.combine(start.date() + timedelta(days=30), time(10))
+        cases = [
+            ('单个医生 下10个空闲号源', lambda: next_free_slots([doctor], start, limit=10)),
+            (f'科室({len(department)}名医生) 下10个', lambda: next_free_slots(department, start, limit=10)),
+            ('科室 下100个(90天窗口)', lambda: next_free_slots(department, start, days=90, limit=100)),
+            ('预约冲突检查', lambda: find_conflict(doctor, probe)),
+        ]
+        print(f'{"查询":<28}{"最短耗时(ms)":>14}{"结果数":>8}')
+        for label, func in cases:
+            elapsed, result = best_of(func, args.repeat)
+            count = len(result) if isinstance(result, list) else int(result is not None)
+            print(f'{label:<28}{elapsed:>14.2f}{count:>8}')
+
+    print(f'\n数据库文件: {db_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import click
+from utils.importer import BulkImporter, ImportAborted, IMPORT_SPECS
+from utils.sales_aggregate import rebuild_medicine_sales, verify_medicine_sales
+from utils.replica import copy_sqlite_replica
+
+
+def init_commands(app):
+    @app.cli.command('import-data')
+    @click.argument('entity', type=click.Choice(sorted(IMPORT_SPECS)))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', type=int, default=None, help='每批插入行数')
+    def import_data(entity, path, batch_size):
+        """从CSV/XLSX文件批量导入患者、医生或药品"""
+        importer = BulkImporter(
+            entity,
+            batch_size=batch_size or app.config['IMPORT_BATCH_SIZE'],
+            max_errors=app.config['IMPORT_MAX_ERRORS']
+        )
+        with open(path, 'rb') as stream:
+            try:
+                result = importer.import_file(stream, path)
+            except ImportAborted as e:
+                raise click.ClickException(f'导入中断: {e}')
+        click.echo(f"导入完成: 成功 {result['imported']} 行, 失败 {result['failed']} 行")
+        for error in result['errors']:
+            click.echo(f"  第{error['row']}行: {error['error']}")
+        if result['errors_truncated']:
+            click.echo(f"  ... 仅显示前 {len(result['errors'])} 条错误")
+
+    @app.cli.command('rebuild-medicine-sales')
+    def rebuild_medicine_sales_command():
+        """根据处方明细重建药品销量汇总表"""
+        count = rebuild_medicine_sales()
+        click.echo(f'药品销量汇总表已重建: {count} 种药品')
+
+    @app.cli.command('verify-medicine-sales')
+    def verify_medicine_sales_command():
+        """校验药品销量汇总表与处方明细是否一致"""
+        mismatches = verify_medicine_sales()
+        if not mismatches:
+            click.echo('药品销量汇总表与处方明细一致')
+            return
+        click.echo(f'发现 {len(mismatches)} 种药品汇总不一致:')
+        for item in mismatches:
+            click.echo(f"  药品{item['medicine_id']}: 销量 {item['actual_sold']} (应为 {item['expected_sold']}), "
+                       f"销售额 {item['actual_revenue']:.2f} (应为 {item['expected_revenue']:.2f})")
+        click.echo('可执行 flask rebuild-medicine-sales 修复')
+        raise SystemExit(1)
+
+    @app.cli.command('sync-replica')
+    def sync_replica_command():
+        """把SQLite主库复制到只读副本文件(本地测试读写分离)"""
+        try:
+            path = copy_sqlite_replica(app)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'只读副本已更新: {path}')
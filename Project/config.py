@@ -9,18 +9,90 @@ class Config:
         'sqlite:///medical_platform.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 数据库引擎配置
+    # SQLite: 每个新连接执行的PRAGMA，WAL模式下读写互不阻塞
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # WAL下只在检查点时同步磁盘，崩溃不会损坏数据库
+        'busy_timeout': 5000,  # 毫秒，等待写锁而不是立即报 database is locked
+        'cache_size': -65536,  # 负数单位为KB，即64MB页缓存
+        'mmap_size': 268435456,  # 256MB，读取走内存映射
+    }
+    # 只读副本：看板、搜索和报表的查询走副本，写入走主库；未配置时全部走主库
+    # 本地测试: REPLICA_DATABASE_URL='sqlite:///file:replica.db?mode=ro&uri=true'，再执行 flask sync-replica
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    REPLICA_RETRY_INTERVAL = 30  # 秒，副本不可用时回退主库，过后再重试
+    REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 60))  # 秒，副本落后超过该时间时回退主库
+    # 服务器数据库(SQL Server等)连接池
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = 1800  # 秒，早于服务器和防火墙断开空闲连接的时间
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_PRE_PING = True  # 取出连接时先检测是否可用
+    
+    # 登录用户身份缓存(秒)，修改密码或角色时立即失效
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    
+    # 密码哈希：werkzeug 的方法及参数，修改后已有用户在下次登录成功时自动按新参数重新哈希
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = 16
+    # 密码校验线程池：同时计算哈希的线程数及排队上限，排满时登录返回503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT = 10  # 秒
+    
+    # 请求指标：/metrics 只允许管理员或携带 METRICS_TOKEN 的抓取请求访问
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # 慢查询日志：执行耗时超过阈值(毫秒)的SQL写入日志文件
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    
     # 文件上传配置
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
     # 报表配置
     REPORTS_FOLDER = 'reports'
+    # 流式生成：分批读取并逐行写入Excel，内存占用不随数据量增长
+    REPORT_STREAMING = os.environ.get('REPORT_STREAMING', 'true').lower() == 'true'
+    REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 1000))
+    # 源数据未变化时复用已生成的报表文件
+    REPORT_REUSE = os.environ.get('REPORT_REUSE', 'true').lower() == 'true'
+    # 后台报表任务：线程数及每种报表同时执行的任务数上限
+    REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    REPORT_JOB_CONCURRENCY = {'medicines': 1, 'appointments': 1, 'patients': 1}
+    # 多worker部署：执行中的任务每隔 HEARTBEAT 秒写入进度和心跳，超过 LEASE 秒无心跳视为中断
+    REPORT_JOB_HEARTBEAT = int(os.environ.get('REPORT_JOB_HEARTBEAT', 5))
+    REPORT_JOB_LEASE = int(os.environ.get('REPORT_JOB_LEASE', 60))
+    
+    # 系统设计图：输出目录(按内容哈希缓存)及并行渲染的进程数
+    DIAGRAMS_FOLDER = 'diagrams'
+    DIAGRAM_WORKERS = int(os.environ.get('DIAGRAM_WORKERS', 4))
+    
+    # 批量导入配置
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_ERRORS = 1000  # 最多返回的错误行数
+    
+    # 看板数据缓存配置: lru(进程内) / filesystem(多worker共享) / null(不缓存)
+    DATA_CACHE_BACKEND = os.environ.get('DATA_CACHE_BACKEND', 'lru')
+    DATA_CACHE_DIR = os.environ.get('DATA_CACHE_DIR', 'cache')
+    DATA_CACHE_TIMEOUT = 300  # 秒，兜底过期时间
+    DATA_CACHE_MAX_ENTRIES = 256
     
 class DevelopmentConfig(Config):
     DEBUG = True
     
 class ProductionConfig(Config):
     DEBUG = False
+    # gunicorn 多worker部署时需共享缓存和数据版本
+    DATA_CACHE_BACKEND = os.environ.get('DATA_CACHE_BACKEND', 'filesystem')
+    # 多worker多线程部署时加大连接池
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # 交接班集中登录时按CPU核数调整
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
     
 config = {
     'development': DevelopmentConfig,
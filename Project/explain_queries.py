@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打印各路由实际执行SQL的查询计划(EXPLAIN QUERY PLAN)
+
+用于确认列表页、看板、查询接口和报表的查询走的是索引查找(SEARCH ... USING INDEX)
+而不是全表扫描(SCAN)。目前仅支持SQLite。
+
+加 --check 时检查按日期筛选预约的路由和报表：对 appointments 的访问必须使用
+包含 date 列的索引；并检查列表页和查询接口执行的SQL语句数不超过 QUERY_BUDGETS，
+防止退化回逐行懒加载(N+1)。任一项不满足时以退出码1结束，可作为回归检查，
+语句数检查需在有数据的数据库上运行(如 python init_data.py 生成的测试数据)。
+
+用法: python explain_queries.py
+      python explain_queries.py --check
+"""
+
+import argparse
+import sys
+import tempfile
+from datetime import datetime
+from sqlalchemy import text
+from app import create_app
+from models import db
+from utils.fulltext import get_search_backend
+from utils.query_counter import count_queries, assert_max_queries
+from utils.reporting import ReportGenerator
+
+TODAY = datetime.now().strftime('%Y-%m-%d')
+
+# 需要检查的只读路由及示例参数
+ROUTES = [
+    '/patients/page?name=张&sort=name',
+    '/doctors/page?department=内科',
+    '/medicines/page?category=处方药',
+    '/appointments/page?doctor_id=1&sort=date',
+    '/dashboard/statistics',
+    '/dashboard/department_distribution',
+    '/dashboard/medicine_top10',
+    '/search/appointments?patient_name=张&start_date=' + TODAY,
+    f'/search/doctors?department=内科&date={TODAY}',
+    '/search/medicines?category=处方药&min_stock=10',
+]
+
+# 按日期筛选预约的路由，日期条件为半开区间时应走以下索引之一
+DATE_FILTERED_ROUTES = [
+    '/dashboard/statistics',
+    f'/search/doctors?date={TODAY}',
+    f'/search/appointments?start_date={TODAY}&end_date={TODAY}',
+    f'/appointments/page?start_date={TODAY}&end_date={TODAY}&sort=date',
+]
+DATE_INDEXES = ('ix_appointments_date', 'ix_appointments_doctor_id_date')
+
+# 路由 -> 每个请求最多执行的SQL语句数，与返回的行数无关
+QUERY_BUDGETS = [
+    ('/appointments', 3),
+    ('/prescriptions', 2),
+    ('/search/appointments?patient_name=张&start_date=' + TODAY, 1),
+]
+
+
+def explain(statement, parameters):
+    """返回一条SQL的查询计划行"""
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def print_plans(title, counter):
+    print(f'\n==================== {title} ====================')
+    for statement, parameters in zip(counter.statements, counter.parameters):
+        if not statement.lstrip().upper().startswith('SELECT'):
+            continue
+        print(f'\n{" ".join(statement.split())[:200]}')
+        for detail in explain(statement, parameters):
+            marker = '!!' if detail.startswith('SCAN') else '  '
+            print(f'  {marker} {detail}')
+
+
+def date_plan_violations(counter):
+    """按日期筛选 appointments 却没有使用 date 索引的查询计划行"""
+    violations = []
+    for statement, parameters in zip(counter.statements, counter.parameters):
+        where = statement.partition('WHERE')[2]
+        if 'appointments.date' not in where:
+            continue
+        for detail in explain(statement, parameters):
+            words = detail.split()
+            if len(words) < 2 or words[0] not in ('SCAN', 'SEARCH') or words[1] != 'appointments':
+                continue
+            if words[0] == 'SCAN' or not any(index in detail for index in DATE_INDEXES):
+                violations.append((' '.join(statement.split())[:200], detail))
+    return violations
+
+
+def check_date_plans(app):
+    client = app.test_client()
+    cases = []
+    for route in DATE_FILTERED_ROUTES:
+        with count_queries() as counter:
+            client.get(route)
+        cases.append((route, counter))
+
+    today = datetime.strptime(TODAY, '%Y-%m-%d')
+    generator = ReportGenerator(reports_folder=tempfile.mkdtemp())
+    with count_queries() as counter:
+        generator.generate_appointment_report(start_date=today, end_date=today)
+    cases.append(('ReportGenerator.generate_appointment_report', counter))
+
+    failed = False
+    for title, counter in cases:
+        violations = date_plan_violations(counter)
+        print(f'{"!!" if violations else "OK"} {title}')
+        for statement, detail in violations:
+            print(f'     {statement}\n     -> {detail}')
+        failed = failed or bool(violations)
+    return not failed
+
+
+def check_query_budgets(app):
+    client = app.test_client()
+    # 全文检索后端在进程内首次使用时检查索引表是否存在，不计入路由的语句数
+    get_search_backend()
+    failed = False
+    for route, limit in QUERY_BUDGETS:
+        try:
+            with assert_max_queries(limit) as counter:
+                response = client.get(route)
+        except AssertionError as e:
+            print(f'!! {route}\n     {e}')
+            failed = True
+            continue
+        print(f'OK {route} ({counter.count}/{limit} 条SQL, 状态码 {response.status_code})')
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--check', action='store_true', help='只检查日期筛选是否使用date索引以及各路由的SQL语句数')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['LOGIN_DISABLED'] = True
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print(f'当前数据库为 {db.engine.dialect.name}，本脚本仅支持SQLite的 EXPLAIN QUERY PLAN')
+            return
+
+        if args.check:
+            plans_ok = check_date_plans(app)
+            budgets_ok = check_query_budgets(app)
+            sys.exit(0 if plans_ok and budgets_ok else 1)
+
+        client = app.test_client()
+        for route in ROUTES:
+            with count_queries() as counter:
+                client.get(route)
+            print_plans(route, counter)
+
+        generator = ReportGenerator(reports_folder=tempfile.mkdtemp())
+        for name in ['generate_medicine_sales_report', 'generate_appointment_report', 'generate_patient_report']:
+            with count_queries() as counter:
+                getattr(generator, name)()
+            print_plans(f'ReportGenerator.{name}', counter)
+
+    print('\n标记为 !! 的行表示全表扫描')
+
+
+if __name__ == '__main__':
+    main()
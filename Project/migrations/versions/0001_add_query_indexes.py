@@ -0,0 +1,40 @@
+"""add indexes for hot query predicates
+
+Revision ID: 0001_add_query_indexes
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_add_query_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_patients_name', 'patients', ['name']),
+    ('ix_patients_contact', 'patients', ['contact']),
+    ('ix_doctors_department', 'doctors', ['department']),
+    ('ix_appointments_doctor_id_date', 'appointments', ['doctor_id', 'date']),
+    ('ix_appointments_patient_id_date', 'appointments', ['patient_id', 'date']),
+    ('ix_appointments_date', 'appointments', ['date']),
+    ('ix_medicines_category', 'medicines', ['category']),
+    ('ix_prescriptions_medicine_id_quantity', 'prescriptions', ['medicine_id', 'quantity']),
+    ('ix_prescriptions_appointment_id', 'prescriptions', ['appointment_id']),
+]
+
+
+def upgrade():
+    # 数据库可能已由 db.create_all() 建好索引，因此使用 if_not_exists
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
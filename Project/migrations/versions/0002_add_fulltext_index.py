@@ -0,0 +1,95 @@
+"""add sqlite fts5 full-text index for patients, doctors and medicines
+
+Revision ID: 0002_add_fulltext_index
+Revises: 0001_add_query_indexes
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_add_fulltext_index'
+down_revision = '0001_add_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+# 迁移中写死建表语句，不引用应用代码，避免以后修改 utils.fulltext 改变已发布迁移的结果
+UPGRADE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5("
+    "name, contact, address, content='patients', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN "
+    "INSERT INTO patients_fts(rowid, name, contact, address) "
+    "VALUES (new.id, new.name, new.contact, new.address); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, contact, address) "
+    "VALUES ('delete', old.id, old.name, old.contact, old.address); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, contact, address) "
+    "VALUES ('delete', old.id, old.name, old.contact, old.address); "
+    "INSERT INTO patients_fts(rowid, name, contact, address) "
+    "VALUES (new.id, new.name, new.contact, new.address); END",
+    "INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doctors_fts USING fts5("
+    "name, specialization, content='doctors', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_ai AFTER INSERT ON doctors BEGIN "
+    "INSERT INTO doctors_fts(rowid, name, specialization) "
+    "VALUES (new.id, new.name, new.specialization); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_ad AFTER DELETE ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialization) "
+    "VALUES ('delete', old.id, old.name, old.specialization); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_au AFTER UPDATE ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialization) "
+    "VALUES ('delete', old.id, old.name, old.specialization); "
+    "INSERT INTO doctors_fts(rowid, name, specialization) "
+    "VALUES (new.id, new.name, new.specialization); END",
+    "INSERT INTO doctors_fts(doctors_fts) VALUES ('rebuild')",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS medicines_fts USING fts5("
+    "name, description, manufacturer, content='medicines', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS medicines_fts_ai AFTER INSERT ON medicines BEGIN "
+    "INSERT INTO medicines_fts(rowid, name, description, manufacturer) "
+    "VALUES (new.id, new.name, new.description, new.manufacturer); END",
+    "CREATE TRIGGER IF NOT EXISTS medicines_fts_ad AFTER DELETE ON medicines BEGIN "
+    "INSERT INTO medicines_fts(medicines_fts, rowid, name, description, manufacturer) "
+    "VALUES ('delete', old.id, old.name, old.description, old.manufacturer); END",
+    "CREATE TRIGGER IF NOT EXISTS medicines_fts_au AFTER UPDATE ON medicines BEGIN "
+    "INSERT INTO medicines_fts(medicines_fts, rowid, name, description, manufacturer) "
+    "VALUES ('delete', old.id, old.name, old.description, old.manufacturer); "
+    "INSERT INTO medicines_fts(rowid, name, description, manufacturer) "
+    "VALUES (new.id, new.name, new.description, new.manufacturer); END",
+    "INSERT INTO medicines_fts(medicines_fts) VALUES ('rebuild')",
+]
+
+DOWNGRADE_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS patients_fts_ai',
+    'DROP TRIGGER IF EXISTS patients_fts_ad',
+    'DROP TRIGGER IF EXISTS patients_fts_au',
+    'DROP TABLE IF EXISTS patients_fts',
+    'DROP TRIGGER IF EXISTS doctors_fts_ai',
+    'DROP TRIGGER IF EXISTS doctors_fts_ad',
+    'DROP TRIGGER IF EXISTS doctors_fts_au',
+    'DROP TABLE IF EXISTS doctors_fts',
+    'DROP TRIGGER IF EXISTS medicines_fts_ai',
+    'DROP TRIGGER IF EXISTS medicines_fts_ad',
+    'DROP TRIGGER IF EXISTS medicines_fts_au',
+    'DROP TABLE IF EXISTS medicines_fts',
+]
+
+
+def upgrade():
+    # 其他数据库使用 LIKE 回退方案，无需建表
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in DOWNGRADE_STATEMENTS:
+        op.execute(statement)
@@ -0,0 +1,44 @@
+"""add incrementally maintained medicine sales aggregate table
+
+Revision ID: 0003_add_medicine_sales
+Revises: 0002_add_fulltext_index
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_medicine_sales'
+down_revision = '0002_add_fulltext_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'medicine_sales',
+        sa.Column('medicine_id', sa.Integer(), nullable=False),
+        sa.Column('total_sold', sa.Integer(), nullable=False),
+        sa.Column('total_revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['medicine_id'], ['medicines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('medicine_id')
+    )
+    op.create_index('ix_medicine_sales_total_sold', 'medicine_sales', ['total_sold'], unique=False)
+
+    # 用现有处方明细初始化汇总
+    op.execute("""
+        INSERT INTO medicine_sales (medicine_id, total_sold, total_revenue)
+        SELECT medicines.id,
+               COALESCE(SUM(prescriptions.quantity), 0),
+               COALESCE(SUM(prescriptions.quantity * medicines.price), 0)
+        FROM medicines
+        LEFT OUTER JOIN prescriptions ON medicines.id = prescriptions.medicine_id
+        GROUP BY medicines.id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_medicine_sales_total_sold', table_name='medicine_sales')
+    op.drop_table('medicine_sales')
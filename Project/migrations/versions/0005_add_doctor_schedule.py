@@ -0,0 +1,31 @@
+"""add doctor schedule columns for slot search and conflict checks
+
+Revision ID: 0005_add_doctor_schedule
+Revises: 0004_add_report_jobs
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_add_doctor_schedule'
+down_revision = '0004_add_report_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 直接 ADD/DROP COLUMN，不用 batch 重建表(重建会丢失 doctors 上的全文索引触发器)
+    op.add_column('doctors', sa.Column('slot_minutes', sa.Integer(), nullable=False, server_default='30'))
+    op.add_column('doctors', sa.Column('work_start', sa.Time(), nullable=False, server_default='08:00:00'))
+    op.add_column('doctors', sa.Column('work_end', sa.Time(), nullable=False, server_default='17:00:00'))
+    op.add_column('doctors', sa.Column('work_days', sa.String(length=7), nullable=False, server_default='12345'))
+
+
+def downgrade():
+    op.drop_column('doctors', 'work_days')
+    op.drop_column('doctors', 'work_end')
+    op.drop_column('doctors', 'work_start')
+    op.drop_column('doctors', 'slot_minutes')
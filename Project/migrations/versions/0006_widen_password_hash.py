@@ -0,0 +1,27 @@
+"""widen users.password_hash for configurable hash methods
+
+Revision ID: 0006_widen_password_hash
+Revises: 0005_add_doctor_schedule
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_widen_password_hash'
+down_revision = '0005_add_doctor_schedule'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # scrypt 哈希长度为162个字符，超过原来的128
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128), type_=sa.String(length=255))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=255), type_=sa.String(length=128))
@@ -0,0 +1,24 @@
+"""add report job heartbeat for multi-worker job claiming and recovery
+
+Revision ID: 0007_add_report_job_heartbeat
+Revises: 0006_widen_password_hash
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_add_report_job_heartbeat'
+down_revision = '0006_widen_password_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('report_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('report_jobs', 'heartbeat_at')
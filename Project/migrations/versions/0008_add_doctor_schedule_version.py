@@ -0,0 +1,74 @@
+"""add doctor schedule_version lock column, sync fts only on indexed column updates
+
+Revision ID: 0008_add_doctor_schedule_version
+Revises: 0007_add_report_job_heartbeat
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_add_doctor_schedule_version'
+down_revision = '0007_add_report_job_heartbeat'
+branch_labels = None
+depends_on = None
+
+
+# 只在索引字段变化时同步全文索引，修改排班、库存等字段不重建索引行
+INDEXED_UPDATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name, contact, address ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, contact, address) "
+    "VALUES ('delete', old.id, old.name, old.contact, old.address); "
+    "INSERT INTO patients_fts(rowid, name, contact, address) "
+    "VALUES (new.id, new.name, new.contact, new.address); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_au AFTER UPDATE OF name, specialization ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialization) "
+    "VALUES ('delete', old.id, old.name, old.specialization); "
+    "INSERT INTO doctors_fts(rowid, name, specialization) "
+    "VALUES (new.id, new.name, new.specialization); END",
+    "CREATE TRIGGER IF NOT EXISTS medicines_fts_au AFTER UPDATE OF name, description, manufacturer ON medicines BEGIN "
+    "INSERT INTO medicines_fts(medicines_fts, rowid, name, description, manufacturer) "
+    "VALUES ('delete', old.id, old.name, old.description, old.manufacturer); "
+    "INSERT INTO medicines_fts(rowid, name, description, manufacturer) "
+    "VALUES (new.id, new.name, new.description, new.manufacturer); END",
+]
+
+# 0002 创建的原始触发器，任意字段更新都会同步
+ANY_UPDATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, contact, address) "
+    "VALUES ('delete', old.id, old.name, old.contact, old.address); "
+    "INSERT INTO patients_fts(rowid, name, contact, address) "
+    "VALUES (new.id, new.name, new.contact, new.address); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_au AFTER UPDATE ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialization) "
+    "VALUES ('delete', old.id, old.name, old.specialization); "
+    "INSERT INTO doctors_fts(rowid, name, specialization) "
+    "VALUES (new.id, new.name, new.specialization); END",
+    "CREATE TRIGGER IF NOT EXISTS medicines_fts_au AFTER UPDATE ON medicines BEGIN "
+    "INSERT INTO medicines_fts(medicines_fts, rowid, name, description, manufacturer) "
+    "VALUES ('delete', old.id, old.name, old.description, old.manufacturer); "
+    "INSERT INTO medicines_fts(rowid, name, description, manufacturer) "
+    "VALUES (new.id, new.name, new.description, new.manufacturer); END",
+]
+
+
+def _replace_update_triggers(statements):
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in ('patients', 'doctors', 'medicines'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_au')
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade():
+    op.add_column('doctors', sa.Column('schedule_version', sa.Integer(), nullable=False, server_default='0'))
+    _replace_update_triggers(INDEXED_UPDATE_TRIGGERS)
+
+
+def downgrade():
+    _replace_update_triggers(ANY_UPDATE_TRIGGERS)
+    op.drop_column('doctors', 'schedule_version')
@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import datetime, time
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from utils.replica import RoutingSession
+from utils.passwords import get_hasher
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     """用户表 - 用于登录认证"""
@@ -12,12 +14,12 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     role = db.Column(db.String(20), default='staff')  # admin, doctor, staff
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_hasher().hash(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -25,6 +27,10 @@ class User(UserMixin, db.Model):
 class Patient(db.Model):
     """患者表"""
     __tablename__ = 'patients'
+    __table_args__ = (
+        db.Index('ix_patients_name', 'name'),
+        db.Index('ix_patients_contact', 'contact'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -44,6 +50,9 @@ class Patient(db.Model):
 class Doctor(db.Model):
     """医生表"""
     __tablename__ = 'doctors'
+    __table_args__ = (
+        db.Index('ix_doctors_department', 'department'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -53,6 +62,13 @@ class Doctor(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
     specialization = db.Column(db.String(200))
+    # 排班：每个号源的时长、每日出诊时间和出诊日(ISO星期，1=周一)
+    slot_minutes = db.Column(db.Integer, nullable=False, default=30, server_default='30')
+    work_start = db.Column(db.Time, nullable=False, default=time(8, 0), server_default='08:00:00')
+    work_end = db.Column(db.Time, nullable=False, default=time(17, 0), server_default='17:00:00')
+    work_days = db.Column(db.String(7), nullable=False, default='12345', server_default='12345')
+    # SQLite 上预约写入时递增，用于锁定排班(见 utils.scheduling.lock_doctor_schedule)
+    schedule_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # 关系
     appointments = db.relationship('Appointment', backref='doctor', lazy=True, cascade='all, delete-orphan')
@@ -63,6 +79,12 @@ class Doctor(db.Model):
 class Appointment(db.Model):
     """预约表"""
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # 医生排班/今日预约按 (doctor_id, date) 查询，患者预约历史按 (patient_id, date) 查询
+        db.Index('ix_appointments_doctor_id_date', 'doctor_id', 'date'),
+        db.Index('ix_appointments_patient_id_date', 'patient_id', 'date'),
+        db.Index('ix_appointments_date', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
@@ -76,11 +98,15 @@ class Appointment(db.Model):
     prescriptions = db.relationship('Prescription', backref='appointment', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
-        return f'<Appointment {self.id} - {self.patient.name} with {self.doctor.name}>'
+        # 只使用外键，避免 repr 触发关联对象的懒加载查询
+        return f'<Appointment {self.id} - patient {self.patient_id} with doctor {self.doctor_id}>'
 
 class Medicine(db.Model):
     """药品表"""
     __tablename__ = 'medicines'
+    __table_args__ = (
+        db.Index('ix_medicines_category', 'category'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -101,6 +127,11 @@ class Medicine(db.Model):
 class Prescription(db.Model):
     """处方表"""
     __tablename__ = 'prescriptions'
+    __table_args__ = (
+        # 覆盖索引：按药品汇总销量时无需回表
+        db.Index('ix_prescriptions_medicine_id_quantity', 'medicine_id', 'quantity'),
+        db.Index('ix_prescriptions_appointment_id', 'appointment_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=False)
@@ -111,4 +142,41 @@ class Prescription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Prescription {self.id} - {self.medicine.name}>' 
\ No newline at end of file
+        return f'<Prescription {self.id} - medicine {self.medicine_id}>'
+
+class MedicineSales(db.Model):
+    """药品销量汇总表 - 随处方增删在同一事务内增量维护"""
+    __tablename__ = 'medicine_sales'
+    __table_args__ = (
+        db.Index('ix_medicine_sales_total_sold', 'total_sold'),
+    )
+    
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.id', ondelete='CASCADE'), primary_key=True)
+    total_sold = db.Column(db.Integer, nullable=False, default=0)  # 累计销量
+    total_revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # 累计销量 × 当前单价
+    
+    def __repr__(self):
+        return f'<MedicineSales {self.medicine_id} - {self.total_sold}>'
+
+class ReportJob(db.Model):
+    """报表任务表 - 后台生成报表的排队、进度和结果"""
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        db.Index('ix_report_jobs_status_report_type', 'status', 'report_type'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex，避免被枚举
+    report_type = db.Column(db.String(20), nullable=False)  # medicines/appointments/patients
+    params = db.Column(db.Text)  # JSON格式的报表参数
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/completed/failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    filepath = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # 执行进程最近一次写入进度的时间
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReportJob {self.id} - {self.report_type} {self.status}>' 
\ No newline at end of file
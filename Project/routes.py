@@ -1,13 +1,348 @@
-from flask import render_template, request, jsonify, send_file, redirect, url_for, flash
+from flask import render_template, request, jsonify, send_file, send_from_directory, redirect, url_for, flash, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime
-import plotly.graph_objs as go
-import plotly.utils
 import json
 import os
-from models import db, Patient, Doctor, Appointment, Medicine, Prescription, User
-from utils.reporting import ReportGenerator
-from utils.system_diagrams import generate_er_diagram, generate_appointment_activity, generate_prescription_sequence, generate_system_architecture
+from sqlalchemy.orm import joinedload, contains_eager
+from models import db, Patient, Doctor, Appointment, Medicine, Prescription, User, MedicineSales, ReportJob
+from utils.reporting import ReportGenerator, REPORTS
+from utils.pagination import keyset_paginate, DEFAULT_PER_PAGE
+from utils.fulltext import get_search_backend
+from utils.inventory import decrement_stock, decrement_stocks
+from utils.importer import BulkImporter, ImportAborted
+from utils.cache import cached, conditional
+from utils.optional import MissingDependency, requires, missing_dependency_response
+from utils.report_jobs import get_report_queue, job_to_dict
+from utils.replica import reads_from_replica
+from utils.dates import parse_day, day_range, on_day
+from utils.passwords import LoginBusy, get_hasher
+from utils.metrics import get_metrics, metrics_authorized, PROMETHEUS_CONTENT_TYPE
+from utils.scheduling import lock_doctor_schedule, find_conflict, next_free_slots, parse_schedule, \
+    parse_slot_start, RELEASED_STATUSES, DEFAULT_SEARCH_DAYS, MAX_SEARCH_DAYS, MAX_SLOTS
+
+# 各列表页允许的排序字段（均为非空列，配合ID做游标分页）
+PATIENT_SORT_FIELDS = {'id': Patient.id, 'name': Patient.name, 'age': Patient.age}
+DOCTOR_SORT_FIELDS = {'id': Doctor.id, 'name': Doctor.name, 'department': Doctor.department}
+MEDICINE_SORT_FIELDS = {'id': Medicine.id, 'name': Medicine.name, 'price': Medicine.price}
+APPOINTMENT_SORT_FIELDS = {'id': Appointment.id, 'date': Appointment.date}
+
+
+def _number_arg(args, name, convert=int):
+    """读取数字类型的查询参数，未提供时返回 None，格式错误时抛出 ValueError"""
+    value = str(args.get(name, '')).strip()
+    if not value:
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f'参数 {name} 格式错误: {value}') from None
+
+
+def _filter_patients(args):
+    """根据请求参数构造患者查询"""
+    query = Patient.query
+    name = args.get('name', '').strip()
+    gender = args.get('gender', '')
+    if name:
+        # 前缀匹配可以利用姓名索引
+        query = query.filter(Patient.name.like(f'{name}%'))
+    if gender:
+        query = query.filter(Patient.gender == gender)
+    return query
+
+
+def _filter_doctors(args):
+    """根据请求参数构造医生查询"""
+    query = Doctor.query
+    name = args.get('name', '').strip()
+    department = args.get('department', '')
+    available = args.get('available', '')
+    if name:
+        query = query.filter(Doctor.name.like(f'{name}%'))
+    if department:
+        query = query.filter(Doctor.department == department)
+    if available in ('true', 'false'):
+        query = query.filter(Doctor.available == (available == 'true'))
+    return query
+
+
+def _filter_medicines(args):
+    """根据请求参数构造药品查询"""
+    query = Medicine.query
+    name = args.get('name', '').strip()
+    category = args.get('category', '')
+    min_stock = _number_arg(args, 'min_stock')
+    max_price = _number_arg(args, 'max_price', float)
+    if name:
+        query = query.filter(Medicine.name.like(f'{name}%'))
+    if category:
+        query = query.filter(Medicine.category == category)
+    if min_stock is not None:
+        query = query.filter(Medicine.stock >= min_stock)
+    if max_price is not None:
+        query = query.filter(Medicine.price <= max_price)
+    return query
+
+
+def _filter_appointments(args):
+    """根据请求参数构造预约查询"""
+    # 列表每行都要显示患者和医生，一次性JOIN加载避免逐行查询
+    query = Appointment.query.options(joinedload(Appointment.patient), joinedload(Appointment.doctor))
+    patient_name = args.get('patient_name', '').strip()
+    doctor_id = _number_arg(args, 'doctor_id')
+    patient_id = _number_arg(args, 'patient_id')
+    status = args.get('status', '')
+    start_date = args.get('start_date', '')
+    end_date = args.get('end_date', '')
+    if patient_name:
+        query = query.join(Appointment.patient).filter(Patient.name.like(f'{patient_name}%'))
+    if doctor_id is not None:
+        query = query.filter(Appointment.doctor_id == doctor_id)
+    if patient_id is not None:
+        query = query.filter(Appointment.patient_id == patient_id)
+    if status:
+        query = query.filter(Appointment.status == status)
+    if start_date or end_date:
+        query = query.filter(day_range(Appointment.date, parse_day(start_date), parse_day(end_date)))
+    return query
+
+
+def _patient_to_dict(patient):
+    return {
+        'id': patient.id,
+        'name': patient.name,
+        'contact': patient.contact,
+        'age': patient.age,
+        'gender': patient.gender,
+        'address': patient.address,
+        'register_date': patient.register_date.strftime('%Y-%m-%d') if patient.register_date else None
+    }
+
+
+def _doctor_to_dict(doctor):
+    return {
+        'id': doctor.id,
+        'name': doctor.name,
+        'department': doctor.department,
+        'title': doctor.title,
+        'phone': doctor.phone,
+        'available': doctor.available,
+        'slot_minutes': doctor.slot_minutes,
+        'work_start': doctor.work_start.strftime('%H:%M') if doctor.work_start else None,
+        'work_end': doctor.work_end.strftime('%H:%M') if doctor.work_end else None,
+        'work_days': doctor.work_days
+    }
+
+
+def _check_schedule(doctor_id, start, status, exclude_id=None):
+    """
+    锁定医生排班并检查时段冲突，返回错误信息，没有冲突返回 None。
+    
+    锁持有到事务结束，调用方随后在同一事务内写入预约并提交(出错时回滚)。
+    """
+    if status in RELEASED_STATUSES:
+        return None
+    if not lock_doctor_schedule(doctor_id):
+        return '医生不存在'
+    conflict = find_conflict(db.session.get(Doctor, doctor_id), start, exclude_id)
+    if conflict:
+        return f"该医生在 {conflict.date.strftime('%Y-%m-%d %H:%M')} 已有预约，与所选时间冲突"
+    return None
+
+
+def _slot_doctors(args):
+    """空闲号源查询的医生范围：指定医生，或某科室全部可预约的医生"""
+    if args.get('doctor_id'):
+        doctor = Doctor.query.filter_by(id=int(args['doctor_id']), available=True).first()
+        if doctor is None:
+            raise ValueError('医生不存在或暂停预约')
+        return [doctor]
+    if args.get('department'):
+        return Doctor.query.filter_by(department=args['department'], available=True).order_by(Doctor.id).all()
+    raise ValueError('请指定 doctor_id 或 department')
+
+
+def _medicine_to_dict(medicine):
+    return {
+        'id': medicine.id,
+        'name': medicine.name,
+        'category': medicine.category,
+        'price': float(medicine.price),
+        'stock': medicine.stock,
+        'manufacturer': medicine.manufacturer,
+        'description': medicine.description,
+        'expiry_date': medicine.expiry_date.strftime('%Y-%m-%d') if medicine.expiry_date else None
+    }
+
+
+def _appointment_to_dict(appointment):
+    return {
+        'id': appointment.id,
+        'patient_id': appointment.patient_id,
+        'doctor_id': appointment.doctor_id,
+        'patient_name': appointment.patient.name,
+        'doctor_name': appointment.doctor.name,
+        'department': appointment.doctor.department,
+        'date': appointment.date.strftime('%Y-%m-%d %H:%M'),
+        'status': appointment.status,
+        'notes': appointment.notes
+    }
+
+
+# ==================== 看板数据(按表数据版本缓存) ====================
+
+def _today_key():
+    return datetime.now().date().isoformat()
+
+
+def _kpi_counts():
+    """统计卡片的各项计数，合并为一条SQL"""
+    row = db.session.execute(db.select(
+        db.select(db.func.count(Patient.id)).scalar_subquery(),
+        db.select(db.func.count(Doctor.id)).scalar_subquery(),
+        db.select(db.func.count(Medicine.id)).scalar_subquery(),
+        db.select(db.func.count(Appointment.id))
+          .where(on_day(Appointment.date)).scalar_subquery()
+    )).one()
+    return {
+        'total_patients': row[0],
+        'total_doctors': row[1],
+        'total_medicines': row[2],
+        'today_appointments': row[3]
+    }
+
+
+def _department_counts():
+    """各科室预约数，返回 (科室列表, 数量列表)"""
+    dept_stats = db.session.query(
+        Doctor.department,
+        db.func.count(Appointment.id).label('count')
+    ).join(Appointment, Doctor.id == Appointment.doctor_id)\
+     .group_by(Doctor.department)\
+     .all()
+    
+    if not dept_stats:
+        # 如果没有数据，返回默认数据
+        dept_stats = [
+            ('内科', 0),
+            ('外科', 0),
+            ('儿科', 0),
+            ('妇科', 0),
+            ('眼科', 0),
+            ('口腔科', 0)
+        ]
+    
+    return [dept[0] for dept in dept_stats], [dept[1] for dept in dept_stats]
+
+
+def _medicine_top10():
+    """销量前10的药品，返回 (药品名称列表, 销量列表)"""
+    # 读取销量汇总表，代价只与药品数有关，与处方历史长度无关
+    total_sold = db.func.coalesce(MedicineSales.total_sold, 0)
+    medicine_stats = db.session.query(
+        Medicine.name,
+        total_sold.label('total_sold')
+    ).outerjoin(MedicineSales, Medicine.id == MedicineSales.medicine_id)\
+     .order_by(total_sold.desc())\
+     .limit(10)\
+     .all()
+    
+    if not medicine_stats:
+        # 如果没有数据，返回默认数据
+        medicine_stats = [
+            ('阿司匹林', 0),
+            ('布洛芬', 0),
+            ('感冒灵颗粒', 0),
+            ('板蓝根颗粒', 0),
+            ('维生素C片', 0)
+        ]
+    
+    return [med[0] for med in medicine_stats], [med[1] for med in medicine_stats]
+
+
+@cached('patients', 'doctors', 'medicines', 'appointments', key=_today_key)
+def _dashboard_statistics():
+    """看板统计卡片数据"""
+    return _kpi_counts()
+
+
+@cached('patients', 'doctors', 'medicines', 'appointments', 'prescriptions', key=_today_key)
+def _dashboard_summary():
+    """看板全部数据：统计卡片和两个图表的标签/数值，共3条SQL"""
+    dept_labels, dept_values = _department_counts()
+    medicine_labels, medicine_values = _medicine_top10()
+    return {
+        'statistics': _kpi_counts(),
+        'department_distribution': {'labels': dept_labels, 'values': dept_values},
+        'medicine_top10': {'labels': medicine_labels, 'values': medicine_values}
+    }
+
+
+@cached('doctors', 'appointments')
+def _department_distribution_figure():
+    """科室分布饼图(Plotly JSON)"""
+    import plotly.graph_objs as go
+    import plotly.utils
+    
+    labels, values = _department_counts()
+    
+    fig = go.Figure(data=[go.Pie(labels=labels, values=values)])
+    fig.update_layout(
+        title='就诊科室分布',
+        height=400
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+@cached('medicines', 'prescriptions')
+def _medicine_top10_figure():
+    """药品销量TOP10柱状图(Plotly JSON)"""
+    import plotly.graph_objs as go
+    import plotly.utils
+    
+    names, sales = _medicine_top10()
+    
+    fig = go.Figure(data=[go.Bar(x=names, y=sales)])
+    fig.update_layout(
+        title='药品销量TOP10',
+        xaxis_title='药品名称',
+        yaxis_title='销量',
+        height=400
+    )
+    
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def _report_response(app, report, generate_xlsx):
+    """按 format 参数返回报表：xlsx(默认)、parquet 生成文件后下载，csv 边查询边输出"""
+    report_format = request.args.get('format', 'xlsx').lower()
+    generator = ReportGenerator.from_config(app.config)
+    if report_format == 'csv':
+        filename = f"{REPORTS[report][0]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        return Response(
+            stream_with_context(generator.iter_csv(report)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    if report_format == 'parquet':
+        filepath = generator.generate_parquet(report)
+    elif report_format == 'xlsx':
+        filepath = generate_xlsx(generator)
+    else:
+        raise ValueError(f'不支持的报表格式: {report_format}')
+    filename = os.path.basename(filepath)
+    print(f"报表已生成: {filepath}")
+    return send_file(filepath, as_attachment=True, download_name=filename)
+
+
+def _get_report_job(job_id):
+    """只能查看自己提交的任务，管理员可查看全部"""
+    job = db.session.get(ReportJob, job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != 'admin'):
+        return None
+    return job
+
 
 def init_routes(app):
     @app.route('/')
@@ -21,9 +356,22 @@ def init_routes(app):
             username = request.form.get('username')
             password = request.form.get('password')
             user = User.query.filter_by(username=username).first()
+            password_hash = user.password_hash if user else None
+            # 校验密码耗时较长，先结束只读事务，校验期间不占用数据库连接
+            db.session.rollback()
             
-            if user and user.check_password(password):
+            try:
+                valid, new_hash = get_hasher().verify_and_update(password_hash, password)
+            except LoginBusy:
+                flash('当前登录人数较多，请稍后再试', 'error')
+                return render_template('login.html'), 503
+            
+            if valid:
                 from flask_login import login_user
+                if new_hash:
+                    # 哈希参数已过期，保存按当前配置计算的新哈希
+                    user.password_hash = new_hash
+                    db.session.commit()
                 login_user(user)
                 return redirect(url_for('index'))
             else:
@@ -42,7 +390,10 @@ def init_routes(app):
     @app.route('/prescriptions')
     @login_required
     def prescriptions():
-        appointments = Appointment.query.all()
+        appointments = Appointment.query.options(
+            joinedload(Appointment.patient),
+            joinedload(Appointment.doctor)
+        ).all()
         medicines = Medicine.query.all()
         return render_template('prescriptions.html', appointments=appointments, medicines=medicines)
 
@@ -55,8 +406,12 @@ def init_routes(app):
             medicine_id = int(data['medicine_id'])
             quantity = int(data['quantity'])
 
-            medicine = Medicine.query.get_or_404(medicine_id)
-            if medicine.stock < quantity:
+            if quantity <= 0:
+                return jsonify({'success': False, 'message': '数量必须大于0'})
+
+            if not decrement_stock(medicine_id, quantity):
+                db.session.rollback()
+                Medicine.query.get_or_404(medicine_id)
                 return jsonify({'success': False, 'message': '库存不足'})
 
             prescription = Prescription(
@@ -65,7 +420,6 @@ def init_routes(app):
                 quantity=quantity,
                 dosage=data.get('dosage', '')
             )
-            medicine.stock -= quantity
             db.session.add(prescription)
             db.session.commit()
             return jsonify({'success': True, 'message': '处方已开具并扣减库存'})
@@ -73,12 +427,116 @@ def init_routes(app):
             db.session.rollback()
             return jsonify({'success': False, 'message': f'失败: {str(e)}'})
 
+    @app.route('/prescriptions/batch', methods=['POST'])
+    @login_required
+    def add_prescription_batch():
+        """一次开具多条处方：同一事务内校验、扣减库存并写入，全部成功或全部失败"""
+        try:
+            data = request.get_json()
+            appointment_id = int(data['appointment_id'])
+            lines = [{
+                'medicine_id': int(item['medicine_id']),
+                'quantity': int(item['quantity']),
+                'dosage': item.get('dosage', ''),
+                'instructions': item.get('instructions', '')
+            } for item in data['items']]
+
+            if not lines:
+                return jsonify({'success': False, 'message': '处方明细不能为空', 'results': []})
+            if db.session.get(Appointment, appointment_id) is None:
+                return jsonify({'success': False, 'message': '预约不存在', 'results': []})
+
+            # 一次 IN 查询校验全部药品
+            quantities = {}
+            for line in lines:
+                quantities[line['medicine_id']] = quantities.get(line['medicine_id'], 0) + line['quantity']
+            medicines = {
+                med.id: med for med in
+                db.session.query(Medicine.id, Medicine.name, Medicine.stock)
+                .filter(Medicine.id.in_(list(quantities))).all()
+            }
+
+            def line_result(line, message=None):
+                medicine = medicines.get(line['medicine_id'])
+                return {
+                    'medicine_id': line['medicine_id'],
+                    'medicine_name': medicine.name if medicine else None,
+                    'quantity': line['quantity'],
+                    'success': message is None,
+                    'message': message or '已开具'
+                }
+
+            def line_error(line):
+                medicine = medicines.get(line['medicine_id'])
+                if medicine is None:
+                    return '药品不存在'
+                if line['quantity'] <= 0:
+                    return '数量必须大于0'
+                if medicine.stock < quantities[line['medicine_id']]:
+                    return f'库存不足(剩余{medicine.stock})'
+                return None
+
+            errors = [line_error(line) for line in lines]
+            if not any(errors) and not decrement_stocks(quantities):
+                # 校验后库存被并发扣减，重新读取库存以给出逐行原因
+                db.session.rollback()
+                medicines = {
+                    med.id: med for med in
+                    db.session.query(Medicine.id, Medicine.name, Medicine.stock)
+                    .filter(Medicine.id.in_(list(quantities))).all()
+                }
+                errors = [line_error(line) or '库存已变化，请重试' for line in lines]
+
+            if any(errors):
+                db.session.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': '处方开具失败，库存未扣减',
+                    'results': [line_result(line, error or '未开具(其他明细校验失败)')
+                                for line, error in zip(lines, errors)]
+                })
+
+            db.session.add_all([
+                Prescription(
+                    appointment_id=appointment_id,
+                    medicine_id=line['medicine_id'],
+                    quantity=line['quantity'],
+                    dosage=line['dosage'],
+                    instructions=line['instructions']
+                ) for line in lines
+            ])
+            db.session.commit()
+            return jsonify({
+                'success': True,
+                'message': f'已开具{len(lines)}条处方并扣减库存',
+                'results': [line_result(line) for line in lines]
+            })
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': f'失败: {str(e)}', 'results': []})
+
     # ==================== 患者管理 CRUD ====================
     @app.route('/patients')
     @login_required
     def patients():
-        patients = Patient.query.all()
-        return render_template('patients.html', patients=patients)
+        try:
+            page = keyset_paginate(_filter_patients(request.args), PATIENT_SORT_FIELDS, Patient.id, request.args)
+        except ValueError as e:
+            # 筛选条件或游标格式错误时提示并回到未筛选的列表
+            flash(str(e), 'error')
+            return redirect(url_for('patients'))
+        return render_template('patients.html', patients=page.items, page=page)
+
+    @app.route('/patients/page')
+    @login_required
+    @conditional('patients')
+    def patients_page():
+        """患者列表分页接口"""
+        try:
+            page = keyset_paginate(_filter_patients(request.args), PATIENT_SORT_FIELDS, Patient.id, request.args)
+            return jsonify(page.to_dict(_patient_to_dict))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     @app.route('/patients/add', methods=['POST'])
     @login_required
@@ -135,8 +593,24 @@ def init_routes(app):
     @app.route('/doctors')
     @login_required
     def doctors():
-        doctors = Doctor.query.all()
-        return render_template('doctors.html', doctors=doctors)
+        try:
+            page = keyset_paginate(_filter_doctors(request.args), DOCTOR_SORT_FIELDS, Doctor.id, request.args)
+        except ValueError as e:
+            # 筛选条件或游标格式错误时提示并回到未筛选的列表
+            flash(str(e), 'error')
+            return redirect(url_for('doctors'))
+        return render_template('doctors.html', doctors=page.items, page=page)
+
+    @app.route('/doctors/page')
+    @login_required
+    @conditional('doctors')
+    def doctors_page():
+        """医生列表分页接口"""
+        try:
+            page = keyset_paginate(_filter_doctors(request.args), DOCTOR_SORT_FIELDS, Doctor.id, request.args)
+            return jsonify(page.to_dict(_doctor_to_dict))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     @app.route('/doctors/add', methods=['POST'])
     @login_required
@@ -148,7 +622,8 @@ def init_routes(app):
                 department=data['department'],
                 title=data['title'],
                 phone=data.get('phone', ''),
-                available=data.get('available', True)
+                available=data.get('available', True),
+                **parse_schedule(data)
             )
             db.session.add(doctor)
             db.session.commit()
@@ -169,6 +644,8 @@ def init_routes(app):
             doctor.title = data['title']
             doctor.phone = data.get('phone', '')
             doctor.available = data.get('available', True)
+            for field, value in parse_schedule(data, doctor).items():
+                setattr(doctor, field, value)
             
             db.session.commit()
             return jsonify({'success': True, 'message': '医生信息更新成功'})
@@ -205,8 +682,24 @@ def init_routes(app):
     @app.route('/medicines')
     @login_required
     def medicines():
-        medicines = Medicine.query.all()
-        return render_template('medicines.html', medicines=medicines)
+        try:
+            page = keyset_paginate(_filter_medicines(request.args), MEDICINE_SORT_FIELDS, Medicine.id, request.args)
+        except ValueError as e:
+            # 筛选条件或游标格式错误时提示并回到未筛选的列表
+            flash(str(e), 'error')
+            return redirect(url_for('medicines'))
+        return render_template('medicines.html', medicines=page.items, page=page)
+
+    @app.route('/medicines/page')
+    @login_required
+    @conditional('medicines')
+    def medicines_page():
+        """药品列表分页接口"""
+        try:
+            page = keyset_paginate(_filter_medicines(request.args), MEDICINE_SORT_FIELDS, Medicine.id, request.args)
+            return jsonify(page.to_dict(_medicine_to_dict))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     @app.route('/medicines/add', methods=['POST'])
     @login_required
@@ -285,13 +778,46 @@ def init_routes(app):
     @app.route('/appointments')
     @login_required
     def appointments():
-        appointments = Appointment.query.join(Patient).join(Doctor).all()
-        patients = Patient.query.all()
+        try:
+            page = keyset_paginate(_filter_appointments(request.args), APPOINTMENT_SORT_FIELDS, Appointment.id, request.args)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('appointments'))
+        # 患者下拉框只预加载首页，其余通过 /patients/page 按姓名检索
+        patients = Patient.query.order_by(Patient.id).limit(DEFAULT_PER_PAGE).all()
         doctors = Doctor.query.filter_by(available=True).all()
         return render_template('appointments.html', 
-                            appointments=appointments, 
+                            appointments=page.items, 
+                            page=page,
                             patients=patients, 
                             doctors=doctors)
+
+    @app.route('/appointments/page')
+    @login_required
+    @conditional('appointments', 'patients', 'doctors')
+    def appointments_page():
+        """预约列表分页接口"""
+        try:
+            page = keyset_paginate(_filter_appointments(request.args), APPOINTMENT_SORT_FIELDS, Appointment.id, request.args)
+            return jsonify(page.to_dict(_appointment_to_dict))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    @app.route('/appointments/slots')
+    @login_required
+    def appointment_slots():
+        """医生或科室最早的空闲号源(doctor_id/department, start, days, limit)"""
+        try:
+            doctors = _slot_doctors(request.args)
+            start = parse_slot_start(request.args.get('start'))
+            days = int(request.args.get('days', DEFAULT_SEARCH_DAYS))
+            limit = int(request.args.get('limit', 10))
+            if days <= 0 or limit <= 0:
+                raise ValueError('days 和 limit 必须为正整数')
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        slots = next_free_slots(doctors, start, min(days, MAX_SEARCH_DAYS), min(limit, MAX_SLOTS))
+        return jsonify({'success': True, 'slots': slots})
     
     @app.route('/appointments/add', methods=['POST'])
     @login_required
@@ -306,6 +832,10 @@ def init_routes(app):
                 notes=data.get('notes', ''),
                 created_at=datetime.now()
             )
+            error = _check_schedule(appointment.doctor_id, appointment.date, appointment.status)
+            if error:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': error}), 409
             db.session.add(appointment)
             db.session.commit()
             return jsonify({'success': True, 'message': '预约创建成功'})
@@ -319,10 +849,16 @@ def init_routes(app):
         try:
             appointment = Appointment.query.get_or_404(appointment_id)
             data = request.get_json()
+            doctor_id = int(data['doctor_id'])
+            date = datetime.strptime(data['date'], '%Y-%m-%d %H:%M')
+            error = _check_schedule(doctor_id, date, data['status'], exclude_id=appointment.id)
+            if error:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': error}), 409
             
             appointment.patient_id = int(data['patient_id'])
-            appointment.doctor_id = int(data['doctor_id'])
-            appointment.date = datetime.strptime(data['date'], '%Y-%m-%d %H:%M')
+            appointment.doctor_id = doctor_id
+            appointment.date = date
             appointment.status = data['status']
             appointment.notes = data.get('notes', '')
             
@@ -351,6 +887,12 @@ def init_routes(app):
             appointment = Appointment.query.get_or_404(appointment_id)
             data = request.get_json()
             new_status = data['status']
+            # 已取消的预约恢复时重新占用号源，需检查冲突
+            if appointment.status in RELEASED_STATUSES:
+                error = _check_schedule(appointment.doctor_id, appointment.date, new_status, exclude_id=appointment.id)
+                if error:
+                    db.session.rollback()
+                    return jsonify({'success': False, 'message': error}), 409
             
             appointment.status = new_status
             db.session.commit()
@@ -367,6 +909,35 @@ def init_routes(app):
             db.session.rollback()
             return jsonify({'success': False, 'message': f'状态更新失败: {str(e)}'})
     
+    # ==================== 批量导入 ====================
+    @app.route('/import/<entity>', methods=['POST'])
+    @login_required
+    def import_data(entity):
+        """上传CSV/XLSX文件批量导入患者、医生或药品"""
+        try:
+            upload = request.files.get('file')
+            if upload is None or not upload.filename:
+                return jsonify({'success': False, 'message': '请选择要导入的文件'}), 400
+
+            batch_size = int(request.form.get('batch_size', app.config['IMPORT_BATCH_SIZE']))
+            importer = BulkImporter(entity, batch_size=batch_size, max_errors=app.config['IMPORT_MAX_ERRORS'])
+            # 上传文件由Werkzeug缓存在临时文件中，这里按行流式读取
+            result = importer.import_file(upload.stream, upload.filename)
+            return jsonify({
+                'success': True,
+                'message': f"导入完成: 成功 {result['imported']} 行, 失败 {result['failed']} 行",
+                **result
+            })
+        except ImportAborted as e:
+            # 之前的批次已提交，返回进度以便从未导入的行继续
+            return jsonify({'success': False, 'message': f'导入中断: {e}', **e.result}), 500
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': f'导入失败: {str(e)}'}), 500
+    
     @app.route('/dashboard')
     @login_required
     def dashboard():
@@ -374,119 +945,68 @@ def init_routes(app):
     
     @app.route('/dashboard/statistics')
     @login_required
+    @reads_from_replica
+    @conditional('patients', 'doctors', 'medicines', 'appointments', key=_today_key)
     def dashboard_statistics():
         """获取dashboard统计数据"""
         try:
-            # 获取统计数据
-            total_patients = Patient.query.count()
-            total_doctors = Doctor.query.count()
-            total_medicines = Medicine.query.count()
-            
-            # 获取今日预约数
-            today = datetime.now().date()
-            today_appointments = Appointment.query.filter(
-                db.func.date(Appointment.date) == today
-            ).count()
-            
-            return jsonify({
-                'total_patients': total_patients,
-                'total_doctors': total_doctors,
-                'total_medicines': total_medicines,
-                'today_appointments': today_appointments
-            })
+            return jsonify(_dashboard_statistics())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/dashboard/summary')
+    @login_required
+    @reads_from_replica
+    @conditional('patients', 'doctors', 'medicines', 'appointments', 'prescriptions', key=_today_key)
+    def dashboard_summary():
+        """看板全部数据，一次请求返回统计卡片和图表的标签/数值"""
+        try:
+            return jsonify(_dashboard_summary())
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/dashboard/department_distribution')
     @login_required
+    @requires('plotly')
+    @reads_from_replica
+    @conditional('doctors', 'appointments')
     def department_distribution():
         try:
-            # 优化查询：使用子查询避免N+1问题
-            dept_stats = db.session.query(
-                Doctor.department,
-                db.func.count(Appointment.id).label('count')
-            ).join(Appointment, Doctor.id == Appointment.doctor_id)\
-             .group_by(Doctor.department)\
-             .all()
-            
-            if not dept_stats:
-                # 如果没有数据，返回默认数据
-                dept_stats = [
-                    ('内科', 0),
-                    ('外科', 0),
-                    ('儿科', 0),
-                    ('妇科', 0),
-                    ('眼科', 0),
-                    ('口腔科', 0)
-                ]
-            
-            labels = [dept[0] for dept in dept_stats]
-            values = [dept[1] for dept in dept_stats]
-            
-            fig = go.Figure(data=[go.Pie(labels=labels, values=values)])
-            fig.update_layout(
-                title='就诊科室分布',
-                height=400
-            )
-            
-            return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+            return _department_distribution_figure()
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/dashboard/medicine_top10')
     @login_required
+    @requires('plotly')
+    @reads_from_replica
+    @conditional('medicines', 'prescriptions')
     def medicine_top10():
         try:
-            # 优化查询：使用LEFT JOIN确保包含所有药品
-            medicine_stats = db.session.query(
-                Medicine.name,
-                db.func.coalesce(db.func.sum(Prescription.quantity), 0).label('total_sold')
-            ).outerjoin(Prescription, Medicine.id == Prescription.medicine_id)\
-             .group_by(Medicine.id, Medicine.name)\
-             .order_by(db.func.coalesce(db.func.sum(Prescription.quantity), 0).desc())\
-             .limit(10)\
-             .all()
-            
-            if not medicine_stats:
-                # 如果没有数据，返回默认数据
-                medicine_stats = [
-                    ('阿司匹林', 0),
-                    ('布洛芬', 0),
-                    ('感冒灵颗粒', 0),
-                    ('板蓝根颗粒', 0),
-                    ('维生素C片', 0)
-                ]
-            
-            names = [med[0] for med in medicine_stats]
-            sales = [med[1] for med in medicine_stats]
-            
-            fig = go.Figure(data=[go.Bar(x=names, y=sales)])
-            fig.update_layout(
-                title='药品销量TOP10',
-                xaxis_title='药品名称',
-                yaxis_title='销量',
-                height=400
-            )
-            
-            return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+            return _medicine_top10_figure()
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/search/appointments')
     @login_required
+    @reads_from_replica
+    @conditional('appointments', 'patients', 'doctors')
     def search_appointments():
         patient_name = request.args.get('patient_name', '')
         start_date = request.args.get('start_date', '')
         end_date = request.args.get('end_date', '')
         
-        query = Appointment.query.join(Patient)
+        query = Appointment.query.join(Appointment.patient)\
+            .options(contains_eager(Appointment.patient), joinedload(Appointment.doctor))
         
         if patient_name:
-            query = query.filter(Patient.name.like(f'%{patient_name}%'))
-        if start_date:
-            query = query.filter(Appointment.date >= datetime.strptime(start_date, '%Y-%m-%d'))
-        if end_date:
-            query = query.filter(Appointment.date <= datetime.strptime(end_date, '%Y-%m-%d'))
+            query = query.filter(Appointment.patient_id.in_(
+                get_search_backend().matching_ids(Patient, patient_name, columns=['name'])))
+        if start_date or end_date:
+            try:
+                query = query.filter(day_range(Appointment.date, parse_day(start_date), parse_day(end_date)))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         appointments = query.all()
         return jsonify([{
@@ -500,6 +1020,8 @@ def init_routes(app):
     
     @app.route('/search/doctors')
     @login_required
+    @reads_from_replica
+    @conditional('doctors', 'appointments')
     def search_doctors():
         department = request.args.get('department', '')
         date = request.args.get('date', '')
@@ -508,16 +1030,21 @@ def init_routes(app):
         query = Doctor.query
 
         if name:
-            query = query.filter(Doctor.name.like(f'%{name}%'))
+            query = query.filter(Doctor.id.in_(get_search_backend().matching_ids(Doctor, name, columns=['name'])))
         if department:
             query = query.filter(Doctor.department == department)
         if date:
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            appointments = Appointment.query.filter(
-                db.func.date(Appointment.date) == date_obj.date()
-            ).with_entities(Appointment.doctor_id).all()
-            doctor_ids = [apt.doctor_id for apt in appointments]
-            query = query.filter(Doctor.id.in_(doctor_ids))
+            try:
+                day = parse_day(date)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            # 当天有预约的医生：相关子查询按 (doctor_id, date) 索引逐个医生探测
+            query = query.filter(
+                db.select(Appointment.id).where(
+                    Appointment.doctor_id == Doctor.id,
+                    on_day(Appointment.date, day)
+                ).exists()
+            )
         
         doctors = query.all()
         return jsonify([{
@@ -529,18 +1056,43 @@ def init_routes(app):
             'available': doc.available
         } for doc in doctors])
     
+    @app.route('/search/patients')
+    @login_required
+    @reads_from_replica
+    @conditional('patients')
+    def search_patients():
+        """按姓名、联系方式、地址全文检索患者，按相关度排序"""
+        keyword = request.args.get('q', '').strip()
+        try:
+            limit = min(_number_arg(request.args, 'limit') or 20, 100)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not keyword:
+            return jsonify([])
+        patients = get_search_backend().search(Patient, keyword, limit=limit)
+        return jsonify([_patient_to_dict(patient) for patient in patients])
+    
     @app.route('/search/medicines')
     @login_required
+    @reads_from_replica
+    @conditional('medicines')
     def search_medicines():
         category = request.args.get('category', '')
-        min_stock = request.args.get('min_stock', 0)
+        name = request.args.get('name', '').strip()
+        try:
+            min_stock = _number_arg(request.args, 'min_stock')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         query = Medicine.query
         
+        if name:
+            # 名称、说明、厂家全文检索
+            query = query.filter(Medicine.id.in_(get_search_backend().matching_ids(Medicine, name)))
         if category:
             query = query.filter(Medicine.category == category)
         if min_stock:
-            query = query.filter(Medicine.stock >= int(min_stock))
+            query = query.filter(Medicine.stock >= min_stock)
         
         medicines = query.all()
         return jsonify([{
@@ -557,11 +1109,9 @@ def init_routes(app):
     @login_required
     def report_medicines():
         try:
-            generator = ReportGenerator()
-            filepath = generator.generate_medicine_sales_report()
-            filename = os.path.basename(filepath)
-            print(f"报表已生成: {filepath}")
-            return send_file(filepath, as_attachment=True, download_name=filename)
+            return _report_response(app, 'medicines', lambda generator: generator.generate_medicine_sales_report())
+        except MissingDependency as e:
+            return missing_dependency_response(e)
         except Exception as e:
             print(f"报表生成失败: {str(e)}")
             flash(f'报表生成失败: {str(e)}', 'error')
@@ -571,11 +1121,9 @@ def init_routes(app):
     @login_required
     def report_appointments():
         try:
-            generator = ReportGenerator()
-            filepath = generator.generate_appointment_report()
-            filename = os.path.basename(filepath)
-            print(f"报表已生成: {filepath}")
-            return send_file(filepath, as_attachment=True, download_name=filename)
+            return _report_response(app, 'appointments', lambda generator: generator.generate_appointment_report())
+        except MissingDependency as e:
+            return missing_dependency_response(e)
         except Exception as e:
             print(f"报表生成失败: {str(e)}")
             flash(f'报表生成失败: {str(e)}', 'error')
@@ -585,11 +1133,9 @@ def init_routes(app):
     @login_required
     def report_patients():
         try:
-            generator = ReportGenerator()
-            filepath = generator.generate_patient_report()
-            filename = os.path.basename(filepath)
-            print(f"报表已生成: {filepath}")
-            return send_file(filepath, as_attachment=True, download_name=filename)
+            return _report_response(app, 'patients', lambda generator: generator.generate_patient_report())
+        except MissingDependency as e:
+            return missing_dependency_response(e)
         except Exception as e:
             print(f"报表生成失败: {str(e)}")
             flash(f'报表生成失败: {str(e)}', 'error')
@@ -606,7 +1152,8 @@ def init_routes(app):
             
             files = []
             for filename in os.listdir(reports_folder):
-                if filename.endswith('.xlsx'):
+                # 以.开头的是正在生成的临时文件
+                if filename.endswith(('.xlsx', '.parquet')) and not filename.startswith('.'):
                     filepath = os.path.join(reports_folder, filename)
                     file_stat = os.stat(filepath)
                     files.append({
@@ -639,34 +1186,75 @@ def init_routes(app):
             flash(f'下载失败: {str(e)}', 'error')
             return redirect(url_for('dashboard'))
     
+    @app.route('/report/jobs', methods=['POST'])
+    @login_required
+    def submit_report_job():
+        """提交后台报表任务，立即返回任务ID"""
+        data = request.get_json(silent=True) or request.form
+        try:
+            job = get_report_queue().submit(
+                data.get('type', ''),
+                {'start_date': data.get('start_date'), 'end_date': data.get('end_date')},
+                user_id=current_user.id
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except MissingDependency as e:
+            return missing_dependency_response(e)
+        return jsonify({
+            'success': True,
+            'job': job_to_dict(job),
+            'status_url': url_for('report_job_status', job_id=job.id)
+        }), 202
+    
+    @app.route('/report/jobs/<job_id>')
+    @login_required
+    def report_job_status(job_id):
+        """查询报表任务状态和进度"""
+        job = _get_report_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': '任务不存在'}), 404
+        data = job_to_dict(job)
+        if job.status == 'completed':
+            data['download_url'] = url_for('report_job_download', job_id=job.id)
+        return jsonify({'success': True, 'job': data})
+    
+    @app.route('/report/jobs/<job_id>/download')
+    @login_required
+    def report_job_download(job_id):
+        """下载已完成任务生成的报表"""
+        job = _get_report_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': '任务不存在'}), 404
+        if job.status != 'completed':
+            return jsonify({'success': False, 'message': '报表尚未生成完成'}), 409
+        if not job.filepath or not os.path.exists(job.filepath):
+            return jsonify({'success': False, 'message': '报表文件不存在'}), 410
+        return send_file(job.filepath, as_attachment=True, download_name=os.path.basename(job.filepath))
+    
     @app.route('/diagrams/generate')
     @login_required
+    @requires('diagrams')
     def generate_diagrams():
-        """生成系统设计图"""
+        """生成系统设计图，内容未变化的图直接返回缓存"""
+        from utils.system_diagrams import DIAGRAMS, diagram_specs, render_diagrams
         try:
-            results = []
-            
-            # 生成ER图
-            result = generate_er_diagram()
-            results.append(('ER图', result))
-            
-            # 生成预约流程活动图
-            result = generate_appointment_activity()
-            results.append(('预约流程活动图', result))
-            
-            # 生成处方开具顺序图
-            result = generate_prescription_sequence()
-            results.append(('处方开具顺序图', result))
-            
-            # 生成系统架构图
-            result = generate_system_architecture()
-            results.append(('系统架构图', result))
+            outcomes = render_diagrams(
+                diagram_specs(db.Model),
+                app.config['DIAGRAMS_FOLDER'],
+                max_workers=app.config['DIAGRAM_WORKERS']
+            )
             
-            # 检查生成的文件
+            results = []
             generated_files = []
-            for file in os.listdir('.'):
-                if file.endswith('.png') and any(keyword in file.lower() for keyword in ['er_diagram', 'appointment_activity', 'prescription_sequence', 'system_architecture']):
-                    generated_files.append(file)
+            for name, label in DIAGRAMS:
+                outcome = outcomes[name]
+                if outcome['error']:
+                    results.append((label, f"{label}生成失败: {outcome['error']}"))
+                    continue
+                state = '未变化，使用缓存' if outcome['cached'] else '生成完成'
+                results.append((label, f"{label}{state}，文件保存为: {outcome['file']}"))
+                generated_files.append(outcome['file'])
             
             return jsonify({
                 'success': True,
@@ -682,17 +1270,26 @@ def init_routes(app):
     @app.route('/diagrams/download/<filename>')
     @login_required
     def download_diagram(filename):
-        """下载图表文件"""
+        """下载图表文件，只允许下载图表目录中的文件"""
         try:
-            if not os.path.exists(filename):
+            folder = os.path.abspath(app.config['DIAGRAMS_FOLDER'])
+            if not os.path.isfile(os.path.join(folder, filename)):
                 flash('文件不存在', 'error')
                 return redirect(url_for('dashboard'))
             
-            return send_file(filename, as_attachment=True, download_name=filename)
+            return send_from_directory(folder, filename, as_attachment=True)
         except Exception as e:
             flash(f'下载失败: {str(e)}', 'error')
             return redirect(url_for('dashboard'))
     
+    # ==================== 监控 ====================
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 文本格式的请求指标，仅管理员或携带 METRICS_TOKEN 的抓取请求可访问"""
+        if not metrics_authorized():
+            return jsonify({'success': False, 'message': '无权访问监控指标'}), 403
+        return Response(get_metrics().render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    
     @app.errorhandler(404)
     def not_found_error(error):
         return render_template('errors/404.html'), 404
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 应用在当前目录下创建上传、报表等目录，慢查询日志也写在相对路径，测试统一放到临时目录
+os.chdir(tempfile.mkdtemp(prefix='medical_test_'))
+
+from config import Config
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def app_config():
+    """创建应用前覆盖的配置项，测试可通过 parametrize 修改"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, app_config):
+    """使用临时SQLite数据库的应用(已建表)，不需要登录"""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+    for name, value in app_config.items():
+        monkeypatch.setattr(Config, name, value)
+    app = create_app()
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
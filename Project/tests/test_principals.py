@@ -0,0 +1,37 @@
+import pytest
+from models import db, User
+from utils.principals import load_principal
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username='admin', email='admin@example.com', role='admin')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_principal_is_cached(app, user_id):
+    with app.test_request_context():
+        principal = load_principal(user_id)
+        assert principal.username == 'admin'
+        assert load_principal(user_id) is principal
+
+
+def test_principal_reloaded_after_users_change(app, user_id):
+    with app.test_request_context():
+        load_principal(user_id)
+        db.session.execute(db.update(User).where(User.id == user_id).values(username='renamed'))
+        db.session.commit()
+        assert load_principal(user_id).username == 'renamed'
+
+
+@pytest.mark.parametrize('app_config', [{'DATA_CACHE_BACKEND': 'null'}])
+def test_null_backend_skips_principal_cache(app, user_id):
+    with app.test_request_context():
+        principal = load_principal(user_id)
+        assert principal.username == 'admin'
+        assert load_principal(user_id) is not principal
+        assert not app.extensions['principal_cache']._entries
+        assert load_principal(user_id + 1) is None
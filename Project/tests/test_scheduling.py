@@ -0,0 +1,41 @@
+from datetime import time
+import pytest
+from models import db, Doctor
+from utils.scheduling import parse_schedule
+
+
+def test_parse_schedule_accepts_working_hours():
+    assert parse_schedule({'work_start': '09:00', 'work_end': '12:00'}) == {
+        'work_start': time(9, 0), 'work_end': time(12, 0)}
+
+
+@pytest.mark.parametrize('data', [
+    {'work_start': '17:00', 'work_end': '08:00'},
+    {'work_start': '09:00', 'work_end': '09:00'},
+    {'work_end': '07:00'},       # 默认 08:00 上班
+    {'work_start': '18:00'},     # 默认 17:00 下班
+])
+def test_parse_schedule_rejects_end_not_after_start(data):
+    with pytest.raises(ValueError):
+        parse_schedule(data)
+
+
+def test_parse_schedule_compares_with_current_doctor():
+    doctor = Doctor(work_start=time(13, 0), work_end=time(18, 0))
+    assert parse_schedule({'work_end': '17:00'}, doctor) == {'work_end': time(17, 0)}
+    with pytest.raises(ValueError):
+        parse_schedule({'work_end': '12:00'}, doctor)
+
+
+def test_edit_doctor_keeps_schedule_when_end_before_start(app, client):
+    with app.app_context():
+        doctor = Doctor(name='李医生', department='内科', title='主治医师', work_start=time(13, 0))
+        db.session.add(doctor)
+        db.session.commit()
+        doctor_id = doctor.id
+
+    response = client.post(f'/doctors/edit/{doctor_id}', json={
+        'name': '李医生', 'department': '内科', 'title': '主治医师', 'work_end': '12:00'})
+    assert response.get_json()['success'] is False
+    with app.app_context():
+        assert db.session.get(Doctor, doctor_id).work_end == time(17, 0)
@@ -0,0 +1,47 @@
+from datetime import datetime
+import pytest
+from models import db, Patient, Doctor, Appointment
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        patient = Patient(name='张三丰', contact='13800138000', age=30, gender='男',
+                          address='北京市朝阳区', register_date=datetime.now())
+        doctor = Doctor(name='李医生', department='内科', title='主治医师', specialization='心血管内科')
+        db.session.add_all([patient, doctor])
+        db.session.flush()
+        db.session.add(Appointment(patient_id=patient.id, doctor_id=doctor.id,
+                                   date=datetime(2026, 10, 20, 9), status='scheduled'))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('term', ['三丰', '张三丰'])
+def test_appointments_match_patient_name(client, seeded, term):
+    response = client.get('/search/appointments', query_string={'patient_name': term})
+    assert [row['patient_name'] for row in response.get_json()] == ['张三丰']
+
+
+@pytest.mark.parametrize('term', ['北京', '北京市朝阳区', '13', '13800138000'])
+def test_appointments_patient_name_ignores_contact_and_address(client, seeded, term):
+    response = client.get('/search/appointments', query_string={'patient_name': term})
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
+@pytest.mark.parametrize('term', ['医生', '李医生'])
+def test_doctors_match_name(client, seeded, term):
+    response = client.get('/search/doctors', query_string={'name': term})
+    assert [row['name'] for row in response.get_json()] == ['李医生']
+
+
+@pytest.mark.parametrize('term', ['心血', '心血管内科'])
+def test_doctors_name_ignores_specialization(client, seeded, term):
+    response = client.get('/search/doctors', query_string={'name': term})
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
+def test_patient_search_still_covers_all_columns(client, seeded):
+    response = client.get('/search/patients', query_string={'q': '北京市朝阳'})
+    assert [row['name'] for row in response.get_json()] == ['张三丰']
@@ -0,0 +1,6 @@
+from benchmarks.import_time import measure
+
+
+def test_create_app_does_not_import_optional_dependencies():
+    _, loaded, _ = measure()
+    assert loaded == []
@@ -0,0 +1,49 @@
+import html
+import json
+import re
+from datetime import datetime
+import pytest
+from models import db, Patient, Doctor, Medicine, Appointment
+
+NAME = """O'Brien"><img src=x onerror=alert(1)>');alert(2);('"""
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        patient = Patient(name=NAME, contact=NAME, age=30, gender='男', address=NAME,
+                          register_date=datetime.now())
+        doctor = Doctor(name=NAME, department=NAME, title=NAME, phone=NAME)
+        medicine = Medicine(name=NAME, category=NAME, price=1.5, stock=10,
+                            manufacturer=NAME, description=NAME)
+        db.session.add_all([patient, doctor, medicine])
+        db.session.flush()
+        db.session.add(Appointment(patient_id=patient.id, doctor_id=doctor.id,
+                                   date=datetime(2026, 10, 20, 9), status='scheduled', notes=NAME))
+        db.session.commit()
+
+
+def _onclick_arguments(page, function):
+    """取出页面中调用 function 的 onclick，按浏览器的方式解码后把参数当作JSON数组解析"""
+    calls = re.findall(rf'onclick="{function}\((.*?)\)"', page)
+    assert calls
+    return [json.loads('[' + re.sub(r"'([^']*)'", r'"\1"', html.unescape(args)) + ']')
+            for args in calls]
+
+
+@pytest.mark.parametrize('url, function, text_positions', [
+    ('/patients', 'editPatient', [1, 2, 5]),
+    ('/patients', 'deletePatient', [1]),
+    ('/doctors', 'editDoctor', [1, 2, 3, 4]),
+    ('/doctors', 'deleteDoctor', [1]),
+    ('/medicines', 'editMedicine', [1, 2, 5, 6]),
+    ('/medicines', 'updateStock', [2]),
+    ('/medicines', 'deleteMedicine', [1]),
+    ('/appointments', 'editAppointment', [5, 6]),
+    ('/appointments', 'deleteAppointment', [1]),
+])
+def test_row_buttons_pass_text_as_string_literals(client, seeded, url, function, text_positions):
+    page = client.get(url).get_data(as_text=True)
+    assert '<img src=x' not in page
+    for args in _onclick_arguments(page, function):
+        assert [args[i] for i in text_positions] == [NAME] * len(text_positions)
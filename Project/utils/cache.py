@@ -0,0 +1,279 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context, request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from utils.replica import current_replica_version
+
+MISSING = object()
+
+
+class NullBackend:
+    """不缓存，用于调试或关闭缓存"""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, timeout):
+        pass
+
+    def get_version(self, table):
+        # 每次都不同，依赖数据版本的报表复用也随之关闭
+        return str(time.time_ns())
+
+    def bump_version(self, table):
+        pass
+
+
+class LRUBackend:
+    """进程内LRU缓存，适合单进程部署"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._versions = {}
+        # 未写过的表使用进程启动时的版本，重启后不会与之前进程的版本混淆
+        self._initial_version = f'boot-{time.time_ns()}'
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_version(self, table):
+        return self._versions.get(table, self._initial_version)
+
+    def bump_version(self, table):
+        with self._lock:
+            self._versions[table] = str(time.time_ns())
+
+
+class FileSystemBackend:
+    """
+    文件系统缓存，多个worker进程共享同一目录。
+
+    数据版本也以文件形式保存，任一进程写库后更新版本文件，
+    其他进程下次读取时即可发现缓存失效。
+    """
+
+    def __init__(self, directory, max_entries=1000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._version_dir = os.path.join(directory, 'versions')
+        os.makedirs(self._version_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def _write(self, path, data):
+        # 先写临时文件再原子替换，避免其他进程读到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISSING
+        if expires < time.time():
+            return MISSING
+        return value
+
+    def set(self, key, value, timeout):
+        self._write(self._path(key), pickle.dumps((time.time() + timeout, value)))
+        self._prune()
+
+    def _prune(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith('.cache')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_version(self, table):
+        try:
+            with open(os.path.join(self._version_dir, table)) as f:
+                return f.read()
+        except OSError:
+            return '0'
+
+    def bump_version(self, table):
+        version = f'{time.time_ns()}-{os.getpid()}'
+        self._write(os.path.join(self._version_dir, table), version.encode('ascii'))
+
+
+class DataCache:
+    """按表数据版本失效的查询结果缓存"""
+
+    def __init__(self, backend, timeout=300):
+        self.backend = backend
+        self.timeout = timeout
+
+    def get_or_compute(self, name, tables, compute):
+        """
+        取缓存值，未命中时调用 compute() 计算并写入缓存。
+
+        缓存键包含名称以及各表当前的数据版本，任一表发生增删改后版本变化，
+        旧缓存自然失效，写操作无需主动删除缓存。
+        """
+        cache_key = f'{name}:{self.versions(tables)}'
+        value = self.backend.get(cache_key)
+        if value is MISSING:
+            value = compute()
+            self.backend.set(cache_key, value, self.timeout)
+        return value
+
+    def versions(self, tables):
+        """各表当前数据版本组成的字符串；查询走只读副本时为副本的数据版本"""
+        replica_version = current_replica_version()
+        if replica_version is not None:
+            return replica_version
+        return ','.join(f'{t}={self.backend.get_version(t)}' for t in tables)
+
+    def etag(self, name, tables):
+        """由名称和各表数据版本生成ETag，null后端没有稳定版本时返回None"""
+        if isinstance(self.backend, NullBackend):
+            return None
+        return hashlib.sha1(f'{name}:{self.versions(tables)}'.encode('utf-8')).hexdigest()
+
+    def bump(self, tables):
+        for table in tables:
+            self.backend.bump_version(table)
+
+
+def create_backend(config):
+    backend = config.get('DATA_CACHE_BACKEND', 'lru')
+    if backend == 'filesystem':
+        return FileSystemBackend(config['DATA_CACHE_DIR'], max_entries=config.get('DATA_CACHE_MAX_ENTRIES', 1000))
+    if backend == 'null':
+        return NullBackend()
+    return LRUBackend(max_size=config.get('DATA_CACHE_MAX_ENTRIES', 256))
+
+
+def get_cache():
+    return current_app.extensions['data_cache']
+
+
+def cached(*tables, key=None):
+    """
+    缓存函数返回值(需可被pickle)，tables 为结果所依赖的表。
+    key 可返回额外的缓存键部分，例如当前日期。
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            extra = key() if key else ''
+            return get_cache().get_or_compute(
+                f'{name}:{args!r}:{kwargs!r}:{extra}', tables, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def conditional(*tables, key=None):
+    """
+    为只读JSON接口加上ETag，支持 If-None-Match 条件请求。
+
+    ETag 由请求路径、参数和所依赖表的数据版本计算，客户端带着未过期的ETag请求时
+    直接返回304，不执行视图函数。没有稳定数据版本时退回按响应内容计算ETag，
+    仍可节省传输。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            extra = key() if key else ''
+            etag = get_cache().etag(f'{request.full_path}:{extra}', tables)
+            if etag and etag in request.if_none_match:
+                response = make_response('', 304)
+                response.set_etag(etag)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if etag:
+                    response.set_etag(etag)
+                else:
+                    response.add_etag()
+                response.make_conditional(request)
+            # 浏览器可以缓存，但每次使用前都要带ETag验证
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# ==================== 写操作追踪 ====================
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+def mark_changed(session, *tables):
+    """记录在ORM之外(如映射器事件中用Core语句)修改的表，提交后同样更新数据版本"""
+    if session is not None:
+        _changed_tables(session).update(tables)
+
+
+def _track_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            _changed_tables(session).add(table)
+
+
+def _track_bulk_dml(orm_execute_state):
+    # db.session.execute(update/insert/delete(...)) 不经过flush，需单独记录
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _changed_tables(orm_execute_state.session).add(mapper.local_table.name)
+
+
+def _bump_after_commit(session):
+    tables = session.info.pop('changed_tables', None)
+    if tables and has_app_context() and 'data_cache' in current_app.extensions:
+        get_cache().bump(tables)
+
+
+def _discard_after_rollback(session):
+    session.info.pop('changed_tables', None)
+
+
+def init_cache(app):
+    """初始化数据缓存，并在每次提交后更新被修改表的数据版本"""
+    app.extensions['data_cache'] = DataCache(create_backend(app.config), timeout=app.config.get('DATA_CACHE_TIMEOUT', 300))
+    if not event.contains(Session, 'after_flush', _track_flush):
+        event.listen(Session, 'after_flush', _track_flush)
+        event.listen(Session, 'do_orm_execute', _track_bulk_dml)
+        event.listen(Session, 'after_commit', _bump_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
@@ -0,0 +1,49 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+
+
+def engine_options(config):
+    """
+    按数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS，需在 db.init_app 之前设置。
+
+    SQLite 只需设置驱动层的锁等待时间(PRAGMA 在连接建立时执行)；
+    服务器数据库使用连接池参数，SQL Server(pyodbc)开启 fast_executemany 加速批量写入。
+    配置中显式给出的 SQLALCHEMY_ENGINE_OPTIONS 优先。
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        busy_timeout = config.get('SQLITE_PRAGMAS', {}).get('busy_timeout', 5000)
+        options = {'connect_args': {'timeout': busy_timeout / 1000}}
+    else:
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+        if url.get_backend_name() == 'mssql' and url.get_driver_name() == 'pyodbc':
+            options['fast_executemany'] = True
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """为 SQLite 引擎注册连接事件，每个新连接执行一次 PRAGMA"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def init_engine_profile(app):
+    """db.init_app 之后调用：为应用的所有 SQLite 引擎设置 PRAGMA"""
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS'))
@@ -0,0 +1,40 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import and_, true
+
+
+def parse_day(value):
+    """解析 YYYY-MM-DD，空值返回 None，格式错误时抛出 ValueError"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'日期格式应为 YYYY-MM-DD: {value}') from None
+
+
+def _day_start(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    return datetime.combine(day, time.min)
+
+
+def day_range(column, start=None, end=None):
+    """
+    按天筛选日期时间列：[start, end] 两端都包含整天，转换为半开区间
+    column >= start 当天0点 AND column < end 次日0点。
+
+    不对列套 date() 等函数，(doctor_id, date)、date 索引可以直接做范围查找。
+    start/end 可为 date、datetime(只取日期部分)或 None(该端不限制)。
+    """
+    conditions = []
+    if start is not None:
+        conditions.append(column >= _day_start(start))
+    if end is not None:
+        conditions.append(column < _day_start(end) + timedelta(days=1))
+    return and_(*conditions) if conditions else true()
+
+
+def on_day(column, day=None):
+    """某一天(默认今天)的半开区间条件"""
+    day = day or date.today()
+    return day_range(column, day, day)
@@ -0,0 +1,136 @@
+from sqlalchemy import event, DDL
+from models import db, Patient, Doctor, Medicine
+
+# 全文索引覆盖的表和字段
+FULLTEXT_COLUMNS = {
+    Patient: ['name', 'contact', 'address'],
+    Doctor: ['name', 'specialization'],
+    Medicine: ['name', 'description', 'manufacturer'],
+}
+
+# trigram 分词器至少需要3个字符才能走索引，更短的关键词退回 LIKE 子串匹配
+MIN_MATCH_LENGTH = 3
+
+
+def fts_table_name(model):
+    return f'{model.__tablename__}_fts'
+
+
+def fts5_ddl(model):
+    """返回创建FTS5外部内容表及同步触发器的DDL语句"""
+    table = model.__tablename__
+    fts = fts_table_name(model)
+    columns = FULLTEXT_COLUMNS[model]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        # 只在索引字段变化时同步，修改排班、库存等字段不重建索引行
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def fts5_drop_ddl(model):
+    fts = fts_table_name(model)
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + \
+        [f'DROP TABLE IF EXISTS {fts}']
+
+
+def fts5_rebuild_sql(model):
+    """根据内容表重建全文索引"""
+    fts = fts_table_name(model)
+    return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+
+def init_fulltext(app):
+    """在 db.create_all() 建表后为SQLite自动创建全文索引"""
+    for model in FULLTEXT_COLUMNS:
+        if getattr(model, '_fulltext_ddl_registered', False):
+            continue
+        for statement in fts5_ddl(model):
+            event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+        # db.drop_all() 不认识虚拟表，需一并删除，否则重建后索引内容过期
+        for statement in fts5_drop_ddl(model):
+            event.listen(model.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+        model._fulltext_ddl_registered = True
+
+
+def _match_expression(term, columns=None):
+    """把用户输入转成FTS5短语查询，多个词之间为AND；指定 columns 时每个短语只匹配这些字段"""
+    words = term.split()
+    prefix = '{' + ' '.join(columns) + '} : ' if columns else ''
+    return ' AND '.join(prefix + '"' + word.replace('"', '""') + '"' for word in words)
+
+
+def _search_columns(model, columns):
+    """要匹配的字段，默认为全部索引字段；只能是索引字段的子集"""
+    if columns is None:
+        return FULLTEXT_COLUMNS[model]
+    unknown = set(columns) - set(FULLTEXT_COLUMNS[model])
+    if unknown:
+        raise ValueError(f'{model.__tablename__} 没有全文索引字段: {", ".join(sorted(unknown))}')
+    return list(columns)
+
+
+class LikeSearch:
+    """通用后端：LIKE 子串匹配，不排序"""
+
+    def matching_ids(self, model, term, columns=None):
+        """返回匹配记录ID的子查询，用于过滤关联表；columns 限定匹配的字段(默认全部索引字段)"""
+        conditions = [getattr(model, c).like(f'%{term}%') for c in _search_columns(model, columns)]
+        return db.select(model.id).where(db.or_(*conditions))
+
+    def search(self, model, term, limit=50):
+        """返回匹配记录列表"""
+        return model.query.filter(model.id.in_(self.matching_ids(model, term)))\
+            .order_by(model.id).limit(limit).all()
+
+
+class SQLiteFTS5Search(LikeSearch):
+    """SQLite后端：FTS5 trigram 全文索引，按 bm25 相关度排序"""
+
+    def _is_short(self, term):
+        return any(len(word) < MIN_MATCH_LENGTH for word in term.split())
+
+    def matching_ids(self, model, term, columns=None):
+        if self._is_short(term):
+            return super().matching_ids(model, term, columns)
+        fts = fts_table_name(model)
+        match = _match_expression(term, columns and _search_columns(model, columns))
+        return db.select(db.literal_column('rowid'))\
+            .select_from(db.table(fts))\
+            .where(db.text(f'{fts} MATCH :match').bindparams(match=match))
+
+    def search(self, model, term, limit=50):
+        if self._is_short(term):
+            return super().search(model, term, limit)
+        fts = fts_table_name(model)
+        fts_table = db.table(fts, db.column('rowid'))
+        return model.query.join(fts_table, fts_table.c.rowid == model.id)\
+            .filter(db.text(f'{fts} MATCH :match').bindparams(match=_match_expression(term)))\
+            .order_by(db.text(f'bm25({fts})'))\
+            .limit(limit).all()
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """根据当前数据库选择全文检索后端"""
+    engine = db.engine
+    if engine not in _backends:
+        backend = LikeSearch()
+        if engine.dialect.name == 'sqlite':
+            inspector = db.inspect(engine)
+            if all(inspector.has_table(fts_table_name(model)) for model in FULLTEXT_COLUMNS):
+                backend = SQLiteFTS5Search()
+        _backends[engine] = backend
+    return _backends[engine]
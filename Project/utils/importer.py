@@ -0,0 +1,253 @@
+import csv
+import io
+import os
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from models import db, Patient, Doctor, Medicine
+
+
+def _required(value):
+    if value is None or str(value).strip() == '':
+        raise ValueError('不能为空')
+    return str(value).strip()
+
+
+def _optional(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _int(value):
+    if isinstance(value, int):
+        return value
+    try:
+        return int(float(_required(value)))
+    except (ValueError, TypeError):
+        raise ValueError(f'不是有效的整数: {value}')
+
+
+def _decimal(value):
+    try:
+        return Decimal(_required(value))
+    except InvalidOperation:
+        raise ValueError(f'不是有效的数字: {value}')
+
+
+def _gender(value):
+    value = _required(value)
+    if value not in ('男', '女'):
+        raise ValueError(f'性别只能为男/女: {value}')
+    return value
+
+
+def _bool(value):
+    if value is None or str(value).strip() == '':
+        return True
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', '是', '可用')
+
+
+def _date(value):
+    if value is None or str(value).strip() == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+
+def _datetime(value):
+    if value is None or str(value).strip() == '':
+        return datetime.now()
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d')
+
+
+# 各实体的导入字段: 字段名 -> (转换函数, 表头别名)
+IMPORT_SPECS = {
+    'patients': (Patient, {
+        'name': (_required, ['姓名']),
+        'contact': (_required, ['联系方式']),
+        'age': (_int, ['年龄']),
+        'gender': (_gender, ['性别']),
+        'address': (_optional, ['地址']),
+        'emergency_contact': (_optional, ['紧急联系人']),
+        'register_date': (_datetime, ['注册日期']),
+    }),
+    'doctors': (Doctor, {
+        'name': (_required, ['姓名']),
+        'department': (_required, ['科室']),
+        'title': (_required, ['职称']),
+        'phone': (_optional, ['电话', '联系方式']),
+        'email': (_optional, ['邮箱']),
+        'specialization': (_optional, ['专长']),
+        'available': (_bool, ['状态', '可用']),
+    }),
+    'medicines': (Medicine, {
+        'name': (_required, ['药品名称']),
+        'price': (_decimal, ['单价', '价格']),
+        'category': (_required, ['类别']),
+        'stock': (lambda v: _int(v) if _optional(v) else 0, ['库存']),
+        'description': (_optional, ['说明', '描述']),
+        'manufacturer': (_optional, ['生产厂家', '厂家']),
+        'expiry_date': (_date, ['有效期']),
+    }),
+}
+
+
+def iter_csv_rows(stream):
+    """逐行读取CSV(UTF-8，可带BOM)，不把整个文件读入内存"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    for row in reader:
+        yield header, row
+    text.detach()
+
+
+def iter_xlsx_rows(stream):
+    """以只读模式逐行读取工作簿的第一个工作表"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        for row in rows:
+            yield header, row
+    finally:
+        workbook.close()
+
+
+class ImportAborted(Exception):
+    """读取文件或写库出错，导入中途终止；result 为终止时已提交的进度"""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
+class BulkImporter:
+    """
+    批量导入患者/医生/药品。
+
+    文件按行流式读取，每行校验后放入缓冲区，攒满 batch_size 行后用一条
+    executemany 插入并提交。校验失败的行记录行号和原因后跳过，不影响其他行；
+    内存占用只与批大小和错误上限有关，与文件行数无关。
+
+    已提交的批次不会回滚：文件读取(如编码错误)或写库出错时回滚当前批次并抛出
+    ImportAborted，其中记录已导入的行数和应从哪一行起重新导入。
+    """
+
+    def __init__(self, entity, batch_size=1000, max_errors=1000):
+        if entity not in IMPORT_SPECS:
+            raise ValueError(f'不支持导入的类型: {entity}')
+        self.model, self.fields = IMPORT_SPECS[entity]
+        self.entity = entity
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def _column_map(self, header):
+        """把表头映射到字段名，支持英文字段名和中文别名"""
+        lookup = {}
+        for field, (_, aliases) in self.fields.items():
+            for name in [field] + aliases:
+                lookup[name] = field
+        mapping = {}
+        for index, title in enumerate(header or []):
+            field = lookup.get(str(title).strip()) if title is not None else None
+            if field and field not in mapping.values():
+                mapping[index] = field
+        missing = [f for f, (convert, _) in self.fields.items()
+                   if f not in mapping.values() and convert in (_required, _int, _decimal, _gender)]
+        if missing:
+            raise ValueError(f'缺少必需的列: {", ".join(missing)}')
+        return mapping
+
+    def _record_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line, 'error': message})
+
+    def _abort(self, message, resume_row):
+        """回滚未提交的批次，返回带已提交进度的 ImportAborted"""
+        db.session.rollback()
+        result = self.result()
+        result['resume_from_row'] = resume_row
+        return ImportAborted(
+            f'{message}。已提交 {self.imported} 行，第{resume_row}行及之后的数据未导入', result)
+
+    def _flush(self, batch, first_line, last_line):
+        if not batch:
+            return
+        try:
+            db.session.execute(db.insert(self.model), batch)
+            db.session.commit()
+        except Exception as e:
+            # 只报告驱动层的错误，SQLAlchemy 的异常文本会带上整批参数(患者信息)
+            raise self._abort(f'写入第{first_line}-{last_line}行时出错: {getattr(e, "orig", None) or e}',
+                              first_line) from e
+        self.imported += len(batch)
+
+    def run(self, rows):
+        """rows 为 (表头, 行) 迭代器，返回导入结果；读取或写库出错时抛出 ImportAborted"""
+        mapping = None
+        batch = []
+        # 表头在第1行，数据从第2行开始；batch_start 为当前未提交批次的第一行
+        line = batch_start = 1
+        rows = enumerate(rows, start=2)
+        while True:
+            try:
+                line, (header, row) = next(rows)
+            except StopIteration:
+                break
+            except Exception as e:
+                # 编码错误、CSV格式错误等，后续行的位置无法确定，终止导入；
+                # 文件按块解码，只能确定出错位置在已读取的最后一行之后
+                raise self._abort(f'读取第{line}行之后的内容时出错: {e}', batch_start if batch else line + 1) from e
+            if mapping is None:
+                mapping = self._column_map(header)
+            if not any(value not in (None, '') for value in row):
+                continue
+            values = {}
+            try:
+                for index, field in mapping.items():
+                    raw = row[index] if index < len(row) else None
+                    try:
+                        values[field] = self.fields[field][0](raw)
+                    except (ValueError, TypeError) as e:
+                        raise ValueError(f'{field}: {e}')
+            except ValueError as e:
+                self._record_error(line, str(e))
+                continue
+            if not batch:
+                batch_start = line
+            batch.append(values)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, batch_start, line)
+                batch = []
+        self._flush(batch, batch_start, line)
+        return self.result()
+
+    def import_file(self, stream, filename):
+        """根据扩展名选择CSV或XLSX读取方式"""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.csv':
+            return self.run(iter_csv_rows(stream))
+        if extension in ('.xlsx', '.xlsm'):
+            return self.run(iter_xlsx_rows(stream))
+        raise ValueError(f'不支持的文件格式: {extension}')
+
+    def result(self):
+        return {
+            'entity': self.entity,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
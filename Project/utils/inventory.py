@@ -0,0 +1,36 @@
+from models import db, Medicine
+
+
+def decrement_stock(medicine_id, quantity):
+    """
+    原子扣减库存：UPDATE ... SET stock = stock - :q WHERE id = :id AND stock >= :q
+
+    库存检查和扣减在同一条语句内完成，并发开处方时不会超卖，
+    也不需要先 SELECT 再在事务中持有行锁。返回是否扣减成功。
+    """
+    result = db.session.execute(
+        db.update(Medicine)
+        .where(Medicine.id == medicine_id, Medicine.stock >= quantity)
+        .values(stock=Medicine.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def decrement_stocks(quantities):
+    """
+    一条语句同时扣减多种药品库存，quantities 为 {medicine_id: 数量}。
+
+    只有全部药品库存都足够时才会全部扣减成功(受影响行数等于药品种数)，
+    否则调用方应回滚事务。返回是否全部扣减成功。
+    """
+    if not quantities:
+        return True
+    amount = db.case(quantities, value=Medicine.id)
+    result = db.session.execute(
+        db.update(Medicine)
+        .where(Medicine.id.in_(list(quantities)), Medicine.stock >= amount)
+        .values(stock=Medicine.stock - amount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
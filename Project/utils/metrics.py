@@ -0,0 +1,275 @@
+import bisect
+import contextvars
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from flask import current_app, request, has_request_context, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+from models import db
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+MAX_LOGGED_STATEMENT = 2000
+
+slow_query_logger = logging.getLogger('medical.slow_query')
+# 当前请求的 RequestStats；SQL事件每条语句都要读取，用 ContextVar 比经过 g 代理更快
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    """Prometheus 直方图：各上界的计数、总和与次数"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # bisect_left 找到第一个 >= value 的上界，与 Prometheus 的 le 语义一致
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class EndpointStats:
+    """单个路由(端点+请求方法)的累计指标"""
+
+    __slots__ = ('statuses', 'latency', 'sql_queries', 'sql_seconds', 'template_seconds', 'response_size')
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_queries = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+
+class RequestStats:
+    """当前请求的计数，请求结束时汇总到 MetricsRegistry"""
+
+    __slots__ = ('start', 'sql_count', 'sql_seconds', 'template_start', 'template_seconds')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_start = None
+        self.template_seconds = 0.0
+
+
+class MetricsRegistry:
+    """进程内的请求指标，按 (端点, 请求方法) 分组"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.slow_queries = 0
+
+    def record(self, endpoint, method, status, stats, duration, size):
+        with self._lock:
+            endpoint_stats = self._endpoints.get((endpoint, method))
+            if endpoint_stats is None:
+                endpoint_stats = self._endpoints[(endpoint, method)] = EndpointStats()
+            endpoint_stats.statuses[status] = endpoint_stats.statuses.get(status, 0) + 1
+            endpoint_stats.latency.observe(duration)
+            endpoint_stats.sql_queries.observe(stats.sql_count)
+            endpoint_stats.sql_seconds += stats.sql_seconds
+            endpoint_stats.template_seconds += stats.template_seconds
+            if size is not None:
+                endpoint_stats.response_size.observe(size)
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            lines = [
+                '# HELP medical_http_requests_total 请求数',
+                '# TYPE medical_http_requests_total counter',
+            ]
+            for (endpoint, method), stats in items:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'medical_http_requests_total{{{_labels(endpoint, method)},status="{status}"}} {count}')
+            for name, kind, help_text, attribute in (
+                ('medical_http_request_duration_seconds', 'histogram', '请求耗时(秒)', 'latency'),
+                ('medical_http_request_sql_queries', 'histogram', '每个请求执行的SQL语句数', 'sql_queries'),
+                ('medical_http_request_sql_seconds_total', 'counter', 'SQL执行总耗时(秒)', 'sql_seconds'),
+                ('medical_http_request_template_seconds_total', 'counter', '模板渲染总耗时(秒)', 'template_seconds'),
+                ('medical_http_response_size_bytes', 'histogram', '响应大小(字节)，流式响应不计', 'response_size'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (endpoint, method), stats in items:
+                    value = getattr(stats, attribute)
+                    if kind == 'histogram':
+                        lines.extend(value.lines(name, _labels(endpoint, method)))
+                    else:
+                        lines.append(f'{name}{{{_labels(endpoint, method)}}} {value:.6f}')
+            lines += [
+                '# HELP medical_slow_queries_total 超过慢查询阈值的SQL语句数',
+                '# TYPE medical_slow_queries_total counter',
+                f'medical_slow_queries_total {self.slow_queries}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(endpoint, method):
+    endpoint = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+    return f'endpoint="{endpoint}",method="{method}"'
+
+
+class SQLTimer:
+    """
+    统计当前请求的SQL语句数和执行耗时，超过阈值的语句写入慢查询日志。
+
+    通过引擎的方言执行事件(do_execute 等)包住驱动调用，而不是 before/after_cursor_execute：
+    连接级事件会让每条语句都走 SQLAlchemy 的完整事件分发(SQLite上每条约多12微秒)，
+    方言事件只多一次函数调用。
+    """
+
+    def __init__(self, registry, threshold_ms):
+        self.registry = registry
+        self.threshold = threshold_ms / 1000
+        # 绑定方法每次访问都是新对象，保存一份供 event.contains 判断是否已注册
+        self._listeners = {
+            'do_execute': self.do_execute,
+            'do_execute_no_params': self.do_execute_no_params,
+            'do_executemany': self.do_executemany,
+        }
+
+    def _record(self, statement, elapsed, executemany):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_seconds += elapsed
+        if elapsed >= self.threshold:
+            self.registry.record_slow_query()
+            # 不记录参数，避免患者信息写入日志
+            endpoint = request.endpoint if has_request_context() else '-'
+            sql = re.sub(r'\s+', ' ', statement).strip()[:MAX_LOGGED_STATEMENT]
+            slow_query_logger.warning('%.1fms endpoint=%s executemany=%s %s',
+                                      elapsed * 1000, endpoint, executemany, sql)
+
+    # 监听函数自行调用方言的默认实现并返回 True，SQLAlchemy 不再重复执行
+    def do_execute(self, cursor, statement, parameters, context):
+        start = time.perf_counter()
+        try:
+            context.dialect.do_execute(cursor, statement, parameters, context)
+        finally:
+            self._record(statement, time.perf_counter() - start, False)
+        return True
+
+    def do_execute_no_params(self, cursor, statement, context):
+        start = time.perf_counter()
+        try:
+            context.dialect.do_execute_no_params(cursor, statement, context)
+        finally:
+            self._record(statement, time.perf_counter() - start, False)
+        return True
+
+    def do_executemany(self, cursor, statement, parameters, context):
+        start = time.perf_counter()
+        try:
+            context.dialect.do_executemany(cursor, statement, parameters, context)
+        finally:
+            self._record(statement, time.perf_counter() - start, True)
+        return True
+
+    def attach(self, engine):
+        for name, listener in self._listeners.items():
+            if not event.contains(engine, name, listener):
+                event.listen(engine, name, listener)
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.template_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    stats = _request_stats.get()
+    if stats is not None and stats.template_start is not None:
+        stats.template_seconds += time.perf_counter() - stats.template_start
+        stats.template_start = None
+
+
+def _configure_slow_query_log(path):
+    if not path or any(getattr(h, 'baseFilename', None) == os.path.abspath(path)
+                       for h in slow_query_logger.handlers):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.WARNING)
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
+
+
+def metrics_authorized():
+    """管理员登录后可访问；Prometheus 抓取时用 Authorization: Bearer <METRICS_TOKEN>"""
+    token = current_app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    if token and auth.startswith('Bearer ') and hmac.compare_digest(auth[len('Bearer '):], token):
+        return True
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+
+def init_metrics(app):
+    """
+    注册请求指标和慢查询日志。
+
+    指标保存在各进程内存中，多worker部署时每次抓取只返回处理该请求的worker的数据。
+    """
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    _configure_slow_query_log(app.config.get('SLOW_QUERY_LOG'))
+    timer = SQLTimer(registry, app.config.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    with app.app_context():
+        for engine in db.engines.values():
+            timer.attach(engine)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_metrics():
+        _request_stats.set(RequestStats())
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = _request_stats.get()
+        if stats is not None:
+            _request_stats.set(None)
+            # 流式响应没有 Content-Length，不计大小，耗时只统计到视图返回
+            registry.record(request.endpoint or 'unmatched', request.method, response.status_code,
+                            stats, time.perf_counter() - stats.start, response.content_length)
+        return response
@@ -0,0 +1,45 @@
+import functools
+import importlib.util
+from flask import jsonify
+
+_available = {}
+
+
+class MissingDependency(RuntimeError):
+    """功能所需的可选依赖未安装"""
+
+    def __init__(self, *modules):
+        self.modules = modules
+        super().__init__(f'服务端未安装可选依赖: {", ".join(modules)}，该功能暂不可用')
+
+
+def is_available(module):
+    """检查顶层模块是否已安装，只查找不导入"""
+    if module not in _available:
+        _available[module] = importlib.util.find_spec(module) is not None
+    return _available[module]
+
+
+def missing_dependency_response(error):
+    return jsonify({'success': False, 'message': str(error)}), 503
+
+
+def check_dependencies(*modules):
+    """缺少任一模块时抛出 MissingDependency"""
+    missing = [m for m in modules if not is_available(m)]
+    if missing:
+        raise MissingDependency(*missing)
+
+
+def requires(*modules):
+    """路由装饰器：所需的可选依赖未安装时返回503"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                check_dependencies(*modules)
+            except MissingDependency as e:
+                return missing_dependency_response(e)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
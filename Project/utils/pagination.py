@@ -0,0 +1,135 @@
+import base64
+import binascii
+import json
+from decimal import InvalidOperation
+from datetime import date, datetime
+from models import db
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+
+class KeysetPage:
+    """游标分页结果"""
+
+    def __init__(self, items, next_cursor, per_page, sort, order):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+        self.sort = sort
+        self.order = order
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def to_dict(self, serializer):
+        return {
+            'items': [serializer(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'per_page': self.per_page,
+            'sort': self.sort,
+            'order': self.order
+        }
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (int, float, str, bool)):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort_value, last_id):
+    """将最后一行的排序键编码为不透明游标"""
+    payload = json.dumps([_encode_value(sort_value), last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """解析游标，返回 (排序值, 最后一行ID)"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _decode_value(sort_column, sort_value), int(last_id)
+    except (ValueError, TypeError, InvalidOperation, binascii.Error) as e:
+        # InvalidOperation 来自 Numeric 排序列(如药品价格)，不是 ValueError 的子类
+        raise ValueError(f'无效的分页游标: {cursor}') from e
+
+
+def parse_page_args(args, sort_fields, default_sort='id', default_order='asc'):
+    """从请求参数中解析 sort/order/cursor/per_page"""
+    sort = args.get('sort', default_sort)
+    if sort not in sort_fields:
+        sort = default_sort
+    order = args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        order = default_order
+    try:
+        per_page = int(args.get('per_page', DEFAULT_PER_PAGE))
+    except ValueError:
+        per_page = DEFAULT_PER_PAGE
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    return sort, order, args.get('cursor') or None, per_page
+
+
+def keyset_paginate(query, sort_fields, id_column, args, default_sort='id', default_order='asc'):
+    """
+    基于 (排序列, ID) 的游标分页。
+
+    与 OFFSET 分页不同，每一页都从上一页最后一行的键值处直接定位，
+    因此无论翻到第几页、表有多大，单次请求的代价都相同。
+    排序列必须为非空列，ID 作为并列时的唯一决胜键。
+    """
+    sort, order, cursor, per_page = parse_page_args(args, sort_fields, default_sort, default_order)
+    sort_column = sort_fields[sort]
+    descending = order == 'desc'
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_column)
+        if sort_column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(db.or_(
+                sort_column < sort_value,
+                db.and_(sort_column == sort_value, id_column < last_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                sort_column > sort_value,
+                db.and_(sort_column == sort_value, id_column > last_id)
+            ))
+
+    if sort_column is id_column:
+        ordering = [id_column.desc() if descending else id_column.asc()]
+    elif descending:
+        ordering = [sort_column.desc(), id_column.desc()]
+    else:
+        ordering = [sort_column.asc(), id_column.asc()]
+
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return KeysetPage(items, next_cursor, per_page, sort, order)
@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# 哈希方法的强度排序：scrypt 同时消耗内存，强于只消耗CPU的 pbkdf2
+METHOD_RANK = {'pbkdf2': 1, 'scrypt': 2}
+
+
+def _strength(method):
+    """
+    把哈希前缀解析为可比较的 (方法排序, 成本参数)，无法识别时返回 None。
+
+    'scrypt:32768:8:1' -> (2, (32768, 8, 1))，'pbkdf2:sha256:600000' -> (1, (600000,))
+    """
+    name, *args = method.split(':')
+    try:
+        if name == 'scrypt' and len(args) == 3:
+            return METHOD_RANK[name], tuple(int(arg) for arg in args)
+        if name == 'pbkdf2' and len(args) == 2:
+            return METHOD_RANK[name], (int(args[1]),)
+    except ValueError:
+        pass
+    return None
+
+
+class LoginBusy(Exception):
+    """密码校验线程池已满或排队超时，登录请求应稍后重试"""
+
+
+class PasswordHasher:
+    """
+    按配置的方法和参数计算密码哈希。
+
+    校验在固定大小的线程池中执行(hashlib 计算时释放GIL，可并行)，同时计算的哈希数
+    不超过 workers，排队数超过 queue_size 时直接抛出 LoginBusy，登录高峰不会占满
+    所有请求线程和CPU。
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, workers=2, queue_size=16, timeout=10):
+        self.method = method
+        self.salt_length = salt_length
+        self.timeout = timeout
+        # werkzeug 会把省略的参数补全写入哈希(如 scrypt -> scrypt:32768:8:1)，以补全后的前缀比较
+        self.prefix = self.hash('').split('$', 1)[0]
+        self._strength = _strength(self.prefix)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method, salt_length=self.salt_length)
+
+    def needs_rehash(self, password_hash):
+        """
+        当前配置比已存储的哈希更强时需要重新哈希，只升级不降级。
+
+        方法排序更高，或同一方法下各成本参数都不低于旧值且至少一项更高，或盐更长时为 True；
+        配置了较弱的方法(如本地调试临时降低成本)时保留原哈希。
+        """
+        method, _, rest = password_hash.partition('$')
+        salt = rest.split('$', 1)[0]
+        if len(salt) < self.salt_length:
+            return True
+        stored = _strength(method)
+        if stored is None:
+            return self._strength is not None
+        if self._strength is None or self._strength == stored:
+            return False
+        (rank, params), (stored_rank, stored_params) = self._strength, stored
+        if rank != stored_rank:
+            return rank > stored_rank
+        return len(params) == len(stored_params) and all(new >= old for new, old in zip(params, stored_params))
+
+    def _verify_and_update(self, password_hash, password):
+        if not check_password_hash(password_hash, password):
+            return False, None
+        return True, self.hash(password) if self.needs_rehash(password_hash) else None
+
+    def verify_and_update(self, password_hash, password):
+        """
+        在线程池中校验密码，返回 (是否正确, 新哈希)。排队已满或 timeout 秒内未完成时抛出 LoginBusy。
+
+        密码正确且当前配置比旧哈希更强时，新哈希按当前配置重新计算，否则为 None。
+        """
+        if not password_hash or not password:
+            return False, None
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self._executor.submit(self._verify_and_update, password_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise LoginBusy()
+
+
+def get_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def init_password_hasher(app):
+    """按配置创建密码哈希器"""
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        salt_length=app.config.get('PASSWORD_SALT_LENGTH', 16),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        queue_size=app.config.get('PASSWORD_HASH_QUEUE', 16),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10),
+    )
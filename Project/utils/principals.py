@@ -0,0 +1,114 @@
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from models import db, User
+from utils.cache import MISSING, NullBackend
+
+
+class UserPrincipal(UserMixin):
+    """已登录用户的身份信息(id、用户名、角色)，不绑定数据库会话，可跨请求缓存"""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.username}>'
+
+
+class PrincipalCache:
+    """
+    进程内的用户身份缓存，load_user 命中时不访问数据库。
+
+    条目在 ttl 秒后过期，并记录加载时 users 表的数据版本：本进程修改密码或角色时
+    立即失效，其他worker提交的修改通过数据版本(filesystem缓存后端共享)发现，
+    最迟 ttl 秒后也会重新加载。数据缓存使用 null 后端时不使用本缓存，每次查询数据库。
+    """
+
+    def __init__(self, ttl=60, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires, entry_version, principal = entry
+        if expires < time.monotonic() or entry_version != version:
+            self.invalidate(user_id)
+            return None
+        return principal
+
+    def set(self, principal, version):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[principal.id] = (time.monotonic() + self.ttl, version, principal)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _users_version():
+    """users 表的数据版本；null 后端每次返回新版本，缓存永远不会命中，返回 MISSING 表示不缓存"""
+    data_cache = current_app.extensions.get('data_cache')
+    if data_cache is None:
+        return None
+    if isinstance(data_cache.backend, NullBackend):
+        return MISSING
+    return data_cache.backend.get_version('users')
+
+
+def load_principal(user_id):
+    """Flask-Login 的 user_loader：优先取缓存，未命中时只查询身份字段"""
+    cache = current_app.extensions['principal_cache']
+    user_id = int(user_id)
+    version = _users_version()
+    if version is not MISSING:
+        principal = cache.get(user_id, version)
+        if principal is not None:
+            return principal
+
+    row = db.session.execute(
+        db.select(User.id, User.username, User.role).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    principal = UserPrincipal(*row)
+    if version is not MISSING:
+        cache.set(principal, version)
+    return principal
+
+
+def _after_user_update(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.password_hash.history.has_changes() or state.attrs.role.history.has_changes():
+        _invalidate(target.id)
+
+
+def _after_user_delete(mapper, connection, target):
+    _invalidate(target.id)
+
+
+def _invalidate(user_id):
+    cache = current_app.extensions.get('principal_cache')
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+def init_principal_cache(app):
+    """初始化用户身份缓存，修改密码、角色或删除用户时失效"""
+    app.extensions['principal_cache'] = PrincipalCache(ttl=app.config.get('USER_CACHE_TTL', 60))
+    if not event.contains(User, 'after_update', _after_user_update):
+        event.listen(User, 'after_update', _after_user_update)
+        event.listen(User, 'after_delete', _after_user_delete)
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from models import db
+
+
+class QueryCounter:
+    """统计代码块内执行的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    在 with 块内统计SQL语句数量，需在应用上下文中使用。
+
+        with count_queries() as counter:
+            client.get('/appointments')
+        print(counter.count)
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """
+    断言 with 块内执行的SQL语句不超过 limit 条，
+    用于防止列表页退化回逐行懒加载(N+1)。
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        executed = '\n'.join(f'  {i + 1}. {sql}' for i, sql in enumerate(counter.statements))
+        raise AssertionError(f'执行了 {counter.count} 条SQL，超过上限 {limit} 条:\n{executed}')
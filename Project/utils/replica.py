@@ -0,0 +1,199 @@
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+# 副本上记录数据同步时间(Unix时间戳，秒)的表，用于计算复制延迟
+SYNC_TABLE = 'replica_sync'
+# 同步时间的本地缓存时长(秒)，避免每个请求都查询副本
+SYNC_STATUS_TTL = 1
+
+
+class RoutingSession(Session):
+    """
+    读写分离的会话。
+
+    在 replica_reads() 范围内，只读查询使用只读副本引擎；flush、INSERT/UPDATE/DELETE
+    和加锁的 SELECT ... FOR UPDATE 始终走主库。未配置副本、副本不可用或进入范围时
+    副本落后过多时全部走主库。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('replica_version') and not self._flushing \
+                and not getattr(clause, 'is_dml', False) \
+                and getattr(clause, '_for_update_arg', None) is None and has_app_context():
+            router = current_app.extensions.get('replica_router')
+            engine = router.engine() if router else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    记录只读副本是否可用以及复制延迟。
+
+    首次使用时探测一次副本连接；连接失败或执行中断开后标记为不可用，
+    retry_interval 秒内的查询回退主库，之后再重新探测。副本上 replica_sync 表
+    记录的同步时间早于 max_lag 秒前(或没有该表)时同样回退主库。
+    """
+
+    def __init__(self, app, retry_interval=30, max_lag=60):
+        self.app = app
+        self.retry_interval = retry_interval
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._checked = False
+        self._down_until = 0.0
+        self._synced_at = None
+        self._synced_at_expires = 0.0
+
+    def _replica_engine(self):
+        return self.app.extensions['sqlalchemy'].engines.get(REPLICA_BIND)
+
+    def mark_down(self, error):
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_interval
+            self._checked = False
+        print(f"只读副本不可用，{self.retry_interval}秒内回退主库: {error}")
+
+    def engine(self):
+        """可用的副本引擎，不可用时返回 None"""
+        engine = self._replica_engine()
+        if engine is None or time.monotonic() < self._down_until:
+            return None
+        if not self._checked:
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql('SELECT 1')
+            except Exception as e:
+                self.mark_down(e)
+                return None
+            self._checked = True
+        return engine
+
+    def synced_at(self, engine):
+        """副本数据对应的主库时间，没有同步记录时返回 None"""
+        now = time.monotonic()
+        if now >= self._synced_at_expires:
+            try:
+                with engine.connect() as connection:
+                    synced_at = connection.execute(text(f'SELECT MAX(synced_at) FROM {SYNC_TABLE}')).scalar()
+            except Exception:
+                synced_at = None
+            self._synced_at = float(synced_at) if synced_at is not None else None
+            self._synced_at_expires = now + SYNC_STATUS_TTL
+        return self._synced_at
+
+    def current_version(self):
+        """副本可用且落后不超过 max_lag 秒时返回副本的数据版本，否则返回 None"""
+        engine = self.engine()
+        if engine is None:
+            return None
+        synced_at = self.synced_at(engine)
+        if synced_at is None or time.time() - synced_at > self.max_lag:
+            return None
+        return f'replica-{synced_at!r}'
+
+
+@contextmanager
+def replica_reads():
+    """
+    范围内的只读查询走只读副本，用于看板、搜索和报表这类可以容忍复制延迟的读取。
+
+    进入最外层范围时确定一次是否使用副本，范围内的缓存键和ETag改用副本的数据版本
+    (见 current_replica_version)，不会把副本上的旧数据缓存到主库的新版本下。
+    """
+    session = current_app.extensions['sqlalchemy'].session()
+    depth = session.info.get('replica_depth', 0)
+    if depth == 0:
+        router = current_app.extensions.get('replica_router')
+        session.info['replica_version'] = router.current_version() if router else None
+    session.info['replica_depth'] = depth + 1
+    try:
+        yield
+    finally:
+        session.info['replica_depth'] -= 1
+        if depth == 0:
+            session.info.pop('replica_version', None)
+
+
+def current_replica_version():
+    """当前会话的只读查询走副本时返回副本的数据版本，否则返回 None"""
+    if not has_app_context() or 'replica_router' not in current_app.extensions:
+        return None
+    return current_app.extensions['sqlalchemy'].session().info.get('replica_version')
+
+
+def reads_from_replica(view):
+    """路由装饰器：整个请求的只读查询走只读副本"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _sqlite_path(url):
+    # sqlite:///file:xxx.db?mode=ro&uri=true 形式的URL，数据库名带 file: 前缀
+    database = url.database
+    return database[len('file:'):] if url.query.get('uri') and database.startswith('file:') else database
+
+
+def copy_sqlite_replica(app):
+    """
+    用SQLite在线备份把主库完整复制到副本文件(本地测试读写分离用)，返回副本路径。
+
+    备份期间主库可正常读写，复制结果是某一时刻的一致快照。副本中另写入
+    replica_sync 表记录开始备份的时间，作为副本数据的版本和复制延迟的依据。
+    """
+    engines = app.extensions['sqlalchemy'].engines
+    replica = engines.get(REPLICA_BIND)
+    if replica is None:
+        raise ValueError('未配置只读副本(REPLICA_DATABASE_URL)')
+    primary = engines[None]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise ValueError('只支持在两个SQLite文件之间复制，其他数据库请使用数据库自身的复制功能')
+
+    target_path = _sqlite_path(replica.url)
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    replica.dispose()
+    # 取备份开始前的时间：备份期间提交的写入可能包含也可能不包含，按较早的时间计算延迟
+    synced_at = time.time()
+    source = sqlite3.connect(_sqlite_path(primary.url))
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+        with target:
+            target.execute(f'CREATE TABLE IF NOT EXISTS {SYNC_TABLE} (synced_at REAL NOT NULL)')
+            target.execute(f'DELETE FROM {SYNC_TABLE}')
+            target.execute(f'INSERT INTO {SYNC_TABLE} (synced_at) VALUES (?)', (synced_at,))
+    finally:
+        target.close()
+        source.close()
+    return target_path
+
+
+def init_replica(app):
+    """配置了只读副本时注册路由状态，副本连接断开时立即回退主库"""
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+    router = ReplicaRouter(app, retry_interval=app.config.get('REPLICA_RETRY_INTERVAL', 30),
+                           max_lag=app.config.get('REPLICA_MAX_LAG', 60))
+    app.extensions['replica_router'] = router
+    # 副本的表结构来自主库复制，不参与 create_all/drop_all
+    app.extensions['sqlalchemy'].metadatas.pop(REPLICA_BIND, None)
+
+    with app.app_context():
+        engine = router._replica_engine()
+
+    @event.listens_for(engine, 'handle_error')
+    def on_error(context):
+        if context.is_disconnect:
+            router.mark_down(context.original_exception)
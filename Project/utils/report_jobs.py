@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, ReportJob
+from utils.reporting import ReportGenerator
+from utils.optional import check_dependencies
+
+# 报表类型 -> (生成方法, 接受的参数)
+REPORT_TYPES = {
+    'medicines': ('generate_medicine_sales_report', ()),
+    'appointments': ('generate_appointment_report', ('start_date', 'end_date')),
+    'patients': ('generate_patient_report', ()),
+}
+
+
+class ReportJobQueue:
+    """
+    后台报表任务队列。
+
+    任务记录保存在 report_jobs 表，提交后立即返回任务ID，由本进程的线程池执行。
+    每种报表有并发上限，超出的任务在内存中排队，同类任务完成后再派发，
+    避免大量报表请求占满数据库连接和线程池。
+
+    多worker部署时各进程共用任务表：执行前用条件 UPDATE 把任务从 pending 改为 running，
+    只有更新成功的进程执行。执行中的进度先记在内存，由心跳线程每 heartbeat_interval 秒
+    连同 heartbeat_at 写入任务行(另开连接，不打断报表的流式读取)，其他worker轮询时也能看到；
+    心跳超过 lease 秒未更新的 running 任务视为所在进程已退出，标记为失败。
+    """
+
+    def __init__(self, app, max_workers=2, concurrency=None, lease=60, heartbeat_interval=5):
+        self.app = app
+        self.concurrency = concurrency or {}
+        self.lease = lease
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._lock = threading.Lock()
+        self._running = {report_type: 0 for report_type in REPORT_TYPES}
+        self._waiting = {report_type: deque() for report_type in REPORT_TYPES}
+        # 本进程正在执行的任务 -> 最新进度
+        self._progress = {}
+        self._recovered = False
+        self._heartbeat = None
+
+    def _limit(self, report_type):
+        return self.concurrency.get(report_type, 1)
+
+    def expire_stale(self):
+        """心跳超过租约时间的 running 任务无法续做，标记为失败，返回任务数"""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.lease)
+        count = ReportJob.query.filter(
+            ReportJob.status == 'running',
+            db.func.coalesce(ReportJob.heartbeat_at, ReportJob.started_at) < cutoff
+        ).update({'status': 'failed', 'error': '执行任务的进程已退出，任务中断', 'finished_at': now},
+                 synchronize_session=False)
+        db.session.commit()
+        return count
+
+    def recover(self):
+        """
+        进程首次使用时调用：结束心跳已过期的任务，并把未开始的任务加入本进程队列。
+
+        其他worker可能也排了同一任务，执行前的条件 UPDATE 保证只执行一次。
+        """
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+        self.expire_stale()
+        pending = ReportJob.query.filter_by(status='pending').order_by(ReportJob.created_at).all()
+        for job in pending:
+            self._enqueue(job.id, job.report_type)
+
+    def submit(self, report_type, params=None, user_id=None):
+        """创建任务记录并排队，返回任务"""
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f'不支持的报表类型: {report_type}')
+        check_dependencies(*ReportGenerator.from_config(self.app.config).format_dependencies('xlsx'))
+        self.recover()
+        allowed = REPORT_TYPES[report_type][1]
+        params = {k: v for k, v in (params or {}).items() if k in allowed and v}
+        for value in params.values():
+            datetime.strptime(value, '%Y-%m-%d')
+        job = ReportJob(
+            id=uuid.uuid4().hex,
+            report_type=report_type,
+            params=json.dumps(params, ensure_ascii=False),
+            status='pending',
+            progress=0,
+            user_id=user_id
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._enqueue(job.id, report_type)
+        return job
+
+    def _enqueue(self, job_id, report_type):
+        with self._lock:
+            if self._running[report_type] < self._limit(report_type):
+                self._running[report_type] += 1
+                self._executor.submit(self._run, job_id, report_type)
+            else:
+                self._waiting[report_type].append(job_id)
+
+    def _finish(self, report_type):
+        # 同类任务完成后派发下一个排队任务
+        with self._lock:
+            if self._waiting[report_type]:
+                self._executor.submit(self._run, self._waiting[report_type].popleft(), report_type)
+            else:
+                self._running[report_type] -= 1
+
+    def _update(self, job_id, **values):
+        ReportJob.query.filter_by(id=job_id).update(values)
+        db.session.commit()
+
+    def _run(self, job_id, report_type):
+        try:
+            with self.app.app_context():
+                try:
+                    self._execute(job_id, report_type)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"报表任务 {job_id} 失败: {str(e)}")
+                    self._update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+                finally:
+                    db.session.remove()
+        finally:
+            self._progress.pop(job_id, None)
+            self._finish(report_type)
+
+    def _set_progress(self, job_id, percent):
+        self._progress[job_id] = percent
+
+    def progress_of(self, job):
+        """任务进度：本进程执行的任务取内存中的实时进度，其他worker的任务取心跳写入的进度"""
+        return self._progress.get(job.id, job.progress)
+
+    def _claim(self, job_id):
+        """把任务从 pending 改为 running，返回本进程是否抢到该任务"""
+        now = datetime.utcnow()
+        claimed = ReportJob.query.filter_by(id=job_id, status='pending')\
+            .update({'status': 'running', 'started_at': now, 'heartbeat_at': now}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='report-job-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        table = ReportJob.__table__
+        last_expired = time.monotonic()
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                with self.app.app_context():
+                    active = dict(self._progress)
+                    if active:
+                        now = datetime.utcnow()
+                        # 单独的连接和事务，不影响任务线程中正在进行的流式读取
+                        with db.engine.begin() as connection:
+                            for job_id, percent in active.items():
+                                connection.execute(
+                                    table.update()
+                                    .where(table.c.id == job_id, table.c.status == 'running')
+                                    .values(progress=percent, heartbeat_at=now)
+                                )
+                    # 其他进程的过期任务每个租约周期检查一次
+                    if time.monotonic() - last_expired >= self.lease:
+                        last_expired = time.monotonic()
+                        self.expire_stale()
+                    db.session.remove()
+            except Exception as e:
+                print(f"报表任务心跳失败: {str(e)}")
+
+    def _execute(self, job_id, report_type):
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != 'pending' or not self._claim(job_id):
+            return
+        params = {k: datetime.strptime(v, '%Y-%m-%d') for k, v in json.loads(job.params or '{}').items()}
+        self._progress[job_id] = 0
+        self._start_heartbeat()
+
+        generator = ReportGenerator.from_config(
+            self.app.config,
+            progress=lambda percent: self._set_progress(job_id, percent)
+        )
+        method = getattr(generator, REPORT_TYPES[report_type][0])
+        filepath = method(**params)
+        self._update(job_id, status='completed', progress=100,
+                     filepath=os.path.abspath(filepath), finished_at=datetime.utcnow())
+
+
+def get_report_queue():
+    return current_app.extensions['report_jobs']
+
+
+def job_to_dict(job):
+    data = {
+        'id': job.id,
+        'report_type': job.report_type,
+        'params': json.loads(job.params or '{}'),
+        'status': job.status,
+        'progress': get_report_queue().progress_of(job),
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+    }
+    if job.status == 'completed' and job.filepath:
+        data['filename'] = os.path.basename(job.filepath)
+    return data
+
+
+def init_report_jobs(app):
+    """初始化后台报表任务队列"""
+    app.extensions['report_jobs'] = ReportJobQueue(
+        app,
+        max_workers=app.config.get('REPORT_JOB_WORKERS', 2),
+        concurrency=app.config.get('REPORT_JOB_CONCURRENCY'),
+        lease=app.config.get('REPORT_JOB_LEASE', 60),
+        heartbeat_interval=app.config.get('REPORT_JOB_HEARTBEAT', 5)
+    )
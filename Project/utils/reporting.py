@@ -1,48 +1,360 @@
-import pandas as pd
+import csv
+import functools
+import hashlib
+import io
+import json
 import os
+import tempfile
 from datetime import datetime
-from models import db, Medicine, Prescription, Appointment, Doctor, Patient
+from flask import current_app, has_app_context
+from models import db, Medicine, Prescription, Appointment, Doctor, Patient, MedicineSales
+from utils.optional import check_dependencies
+from utils.replica import replica_reads
+from utils.dates import day_range
+
+# pandas/openpyxl/pyarrow 较重，在生成对应格式时才导入，应用启动时不加载
+
+# 患者年龄分段，与 pd.cut(bins=[0, 18, 30, 50, 70, 100]) 一致(左开右闭)
+AGE_BINS = [0, 18, 30, 50, 70, 100]
+AGE_LABELS = [f'({lower}, {upper}]' for lower, upper in zip(AGE_BINS, AGE_BINS[1:])]
+
+# 报表类型 -> (文件名前缀, 源表)
+REPORTS = {
+    'medicines': ('medicine_sales_report', ('medicines', 'medicine_sales', 'prescriptions')),
+    'appointments': ('appointment_report', ('appointments', 'patients', 'doctors')),
+    'patients': ('patient_report', ('patients', 'appointments')),
+}
+
+# 各报表明细的列：查询字段 -> 中文列名
+DETAIL_HEADERS = {
+    'medicines': {
+        'name': '药品名称',
+        'category': '类别',
+        'price': '单价',
+        'stock': '库存',
+        'total_sold': '销量',
+        'total_revenue': '销售额'
+    },
+    'appointments': {
+        'id': '预约ID',
+        'patient_name': '患者姓名',
+        'doctor_name': '医生姓名',
+        'department': '科室',
+        'date': '预约时间',
+        'status': '状态',
+        'notes': '备注'
+    },
+    'patients': {
+        'id': '患者ID',
+        'name': '姓名',
+        'age': '年龄',
+        'gender': '性别',
+        'register_date': '注册日期',
+        'appointment_count': '预约次数'
+    },
+}
+
+
+def _format_datetimes(series, unit):
+    """向量化格式化日期列，unit='D' 为日期，'m' 精确到分钟；空值为空字符串"""
+    import pandas as pd
+    import numpy as np
+    values = pd.to_datetime(series)
+    text = pd.Series(np.datetime_as_string(values.values, unit=unit), index=series.index)\
+        .str.replace('T', ' ', regex=False)
+    return text.where(values.notna(), '')
+
+
+def _age_bucket(age):
+    for lower, upper, label in zip(AGE_BINS, AGE_BINS[1:], AGE_LABELS):
+        if age is not None and lower < age <= upper:
+            return label
+    return None
+
 
 class ReportGenerator:
     """报表生成器"""
     
-    def __init__(self, reports_folder='reports'):
+    def __init__(self, reports_folder='reports', streaming=False, chunk_size=1000, progress=None, reuse=False):
         self.reports_folder = reports_folder
+        # 流式模式：分批读取查询结果并用只写工作簿逐行写出，内存占用与行数无关
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        # 进度回调 progress(percent)，后台任务用来更新进度
+        self.progress = progress
+        # 复用模式：输入指纹相同的报表已存在时直接返回该文件
+        self.reuse = reuse
         os.makedirs(reports_folder, exist_ok=True)
     
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """按应用配置创建报表生成器"""
+        return cls(
+            config.get('REPORTS_FOLDER', 'reports'),
+            streaming=config.get('REPORT_STREAMING', False),
+            chunk_size=config.get('REPORT_CHUNK_SIZE', 1000),
+            reuse=config.get('REPORT_REUSE', False),
+            **kwargs
+        )
+    
+    def format_dependencies(self, report_format):
+        """生成某种格式的报表文件所需的可选依赖"""
+        if report_format == 'parquet':
+            return ('pyarrow',)
+        if report_format == 'xlsx':
+            return ('openpyxl',) if self.streaming else ('openpyxl', 'pandas')
+        return ()
+    
+    def _report_progress(self, percent):
+        if self.progress:
+            self.progress(percent)
+    
+    # ==================== 生成与复用 ====================
+    
+    def _source_state(self, tables):
+        """各源表的行数、最大主键和数据版本，任一表增删改后都会变化"""
+        columns = []
+        for name in tables:
+            table = db.metadata.tables[name]
+            pk = list(table.primary_key.columns)[0]
+            columns.append(db.select(db.func.count()).select_from(table).scalar_subquery())
+            columns.append(db.select(db.func.max(pk)).scalar_subquery())
+        row = db.session.execute(db.select(*columns)).one()
+        state = {name: list(row[i * 2:i * 2 + 2]) for i, name in enumerate(tables)}
+        # 行数和最大ID反映不了原地修改，再加上提交时更新的数据版本
+        if has_app_context() and 'data_cache' in current_app.extensions:
+            state['versions'] = current_app.extensions['data_cache'].versions(tables)
+        return state
+    
+    def _fingerprint(self, prefix, tables, params, extension):
+        payload = {
+            'report': prefix,
+            'format': extension,
+            'streaming': self.streaming,
+            'params': {k: v.isoformat() if hasattr(v, 'isoformat') else v for k, v in params.items()},
+            'sources': self._source_state(tables),
+        }
+        text = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    
+    def _find_report(self, prefix, fingerprint, extension):
+        suffix = f'_{fingerprint}.{extension}'
+        for filename in os.listdir(self.reports_folder):
+            if filename.startswith(prefix) and filename.endswith(suffix):
+                return os.path.join(self.reports_folder, filename)
+        return None
+    
+    def _generate(self, prefix, tables, write, extension='xlsx', **params):
+        """
+        生成报表文件并返回路径。
+        
+        复用模式下文件名带输入指纹(报表类型、参数、源表状态)，指纹相同的文件
+        已存在时直接返回。先写临时文件再改名，未写完的文件不会被复用或下载。
+        配置了只读副本时，指纹和报表数据都从副本读取。
+        """
+        check_dependencies(*self.format_dependencies(extension))
+        with replica_reads():
+            return self._write_report(prefix, tables, write, extension, params)
+    
+    def _write_report(self, prefix, tables, write, extension, params):
+        fingerprint = self._fingerprint(prefix, tables, params, extension) if self.reuse else None
+        if fingerprint:
+            existing = self._find_report(prefix, fingerprint, extension)
+            if existing:
+                return existing
+        
+        name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if fingerprint:
+            name += f'_{fingerprint}'
+        filepath = os.path.join(self.reports_folder, f'{name}.{extension}')
+        fd, tmp_path = tempfile.mkstemp(prefix='.', suffix=f'.{extension}', dir=self.reports_folder)
+        os.close(fd)
+        try:
+            write(tmp_path, **params)
+            os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return filepath
+    
+    def _iter_rows(self, query):
+        """使用服务端游标分批读取查询结果，每读完一批汇报一次进度"""
+        total = query.order_by(None).count() if self.progress else 0
+        for index, row in enumerate(query.yield_per(self.chunk_size), start=1):
+            yield row
+            if total and index % self.chunk_size == 0:
+                # 写文件还需要时间，读完全部数据时按95%计
+                self._report_progress(min(95, index * 95 // total))
+    
+    # ==================== 查询 ====================
+    
+    def _medicine_sales_query(self):
+        # 读取销量汇总表，无需扫描处方明细
+        return db.session.query(
+            Medicine.name,
+            Medicine.category,
+            Medicine.price,
+            Medicine.stock,
+            db.func.coalesce(MedicineSales.total_sold, 0).label('total_sold'),
+            db.func.coalesce(MedicineSales.total_revenue, 0).label('total_revenue')
+        ).outerjoin(MedicineSales, Medicine.id == MedicineSales.medicine_id)\
+         .order_by(Medicine.id)
+    
+    def _appointment_query(self, start_date=None, end_date=None):
+        query = db.session.query(
+            Appointment.id,
+            Patient.name.label('patient_name'),
+            Doctor.name.label('doctor_name'),
+            Doctor.department,
+            Appointment.date,
+            Appointment.status,
+            Appointment.notes
+        ).join(Patient).join(Doctor)
+        return self._filter_appointment_dates(query, start_date, end_date)
+    
+    def _filter_appointment_dates(self, query, start_date=None, end_date=None):
+        # 结束日期包含当天全部预约
+        if start_date or end_date:
+            query = query.filter(day_range(Appointment.date, start_date, end_date))
+        return query
+    
+    def _patient_query(self):
+        return db.session.query(
+            Patient.id,
+            Patient.name,
+            Patient.age,
+            Patient.gender,
+            Patient.register_date,
+            db.func.count(Appointment.id).label('appointment_count')
+        ).outerjoin(Appointment)\
+         .group_by(Patient.id, Patient.name, Patient.age, Patient.gender, Patient.register_date)
+    
+    # ==================== 报表 ====================
+    
     def generate_medicine_sales_report(self):
         """生成药品销售报表"""
+        write = self._stream_medicine_sales_report if self.streaming else self._write_medicine_sales_report
+        return self._generate(*REPORTS['medicines'], write)
+    
+    def generate_appointment_report(self, start_date=None, end_date=None):
+        """生成预约报表"""
+        write = self._stream_appointment_report if self.streaming else self._write_appointment_report
+        return self._generate(*REPORTS['appointments'], write, start_date=start_date, end_date=end_date)
+    
+    def generate_patient_report(self):
+        """生成患者报表"""
+        write = self._stream_patient_report if self.streaming else self._write_patient_report
+        return self._generate(*REPORTS['patients'], write)
+    
+    # ==================== 明细导出(CSV/Parquet) ====================
+    
+    def _detail_query(self, report, start_date=None, end_date=None):
+        if report == 'medicines':
+            return self._medicine_sales_query()
+        if report == 'appointments':
+            return self._appointment_query(start_date, end_date)
+        if report == 'patients':
+            return self._patient_query()
+        raise ValueError(f'不支持的报表类型: {report}')
+    
+    def _iter_chunks(self, query):
+        chunk = []
+        for row in self._iter_rows(query):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def iter_csv(self, report, start_date=None, end_date=None):
+        """
+        逐批生成报表明细的CSV文本，用于流式HTTP响应。
+        
+        以UTF-8带BOM编码，Excel可直接打开；没有行数上限，每批 chunk_size 行。
+        """
+        with replica_reads():
+            query = self._detail_query(report, start_date, end_date)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(DETAIL_HEADERS[report].values())
+            yield '\ufeff' + buffer.getvalue()
+            for chunk in self._iter_chunks(query):
+                buffer.seek(0)
+                buffer.truncate()
+                for row in chunk:
+                    writer.writerow(
+                        value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+                        for value in row
+                    )
+                yield buffer.getvalue()
+    
+    def generate_parquet(self, report, start_date=None, end_date=None):
+        """
+        导出报表明细为Parquet文件(zstd压缩)，每 chunk_size 行写一个行组，
+        内存占用只与批大小有关。
+        """
+        return self._generate(*REPORTS[report], functools.partial(self._write_parquet, report=report),
+                              extension='parquet', start_date=start_date, end_date=end_date)
+    
+    def _write_parquet(self, filepath, report, start_date=None, end_date=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        query = self._detail_query(report, start_date, end_date)
+        headers = DETAIL_HEADERS[report]
+        fields, converters = [], []
+        for column in query.statement.selected_columns:
+            if isinstance(column.type, db.DateTime):
+                arrow_type, convert = pa.timestamp('us'), None
+            elif isinstance(column.type, db.Numeric):
+                arrow_type, convert = pa.float64(), float
+            elif isinstance(column.type, db.Integer):
+                arrow_type, convert = pa.int64(), None
+            else:
+                arrow_type, convert = pa.string(), None
+            fields.append(pa.field(headers[column.key], arrow_type))
+            converters.append(convert)
+        schema = pa.schema(fields)
+        
+        with pq.ParquetWriter(filepath, schema, compression='zstd') as writer:
+            for chunk in self._iter_chunks(query):
+                columns = []
+                for index, convert in enumerate(converters):
+                    values = [row[index] for row in chunk]
+                    if convert:
+                        values = [None if v is None else convert(v) for v in values]
+                    columns.append(values)
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema))
+    
+    # ==================== Pandas报表 ====================
+    
+    def _read_frame(self, query, columns):
+        """按列批量读取查询结果为DataFrame，并改为中文列名"""
+        import pandas as pd
+        statement = query.statement
+        # 日期列跳过逐行的Python类型转换，由 pd.to_datetime 整列解析
+        selected = [db.type_coerce(c, db.String).label(c.key) if isinstance(c.type, db.DateTime) else c
+                    for c in statement.selected_columns]
+        statement = statement.with_only_columns(*selected, maintain_column_froms=True)
+        df = pd.read_sql(statement, db.session.connection())
+        return df.rename(columns=columns)[list(columns.values())]
+    
+    def _count_frame(self, query, columns):
+        """GROUP BY 统计结果(通常只有几行)转为DataFrame"""
+        import pandas as pd
+        return pd.DataFrame(query.all(), columns=columns)
+    
+    def _write_medicine_sales_report(self, filepath):
+        import pandas as pd
         try:
-            # 查询药品销售数据
-            query = db.session.query(
-                Medicine.name,
-                Medicine.category,
-                Medicine.price,
-                Medicine.stock,
-                db.func.coalesce(db.func.sum(Prescription.quantity), 0).label('total_sold'),
-                db.func.coalesce(db.func.sum(Prescription.quantity * Medicine.price), 0).label('total_revenue')
-            ).outerjoin(Prescription, Medicine.id == Prescription.medicine_id)\
-             .group_by(Medicine.id, Medicine.name, Medicine.category, Medicine.price, Medicine.stock)
-            
-            # 将查询结果转换为DataFrame
-            results = query.all()
-            data = []
-            for result in results:
-                data.append({
-                    '药品名称': result.name,
-                    '类别': result.category,
-                    '单价': float(result.price),
-                    '库存': result.stock,
-                    '销量': result.total_sold,
-                    '销售额': float(result.total_revenue)
-                })
-            
-            df = pd.DataFrame(data)
+            df = self._read_frame(self._medicine_sales_query(), DETAIL_HEADERS['medicines'])
+            df['单价'] = df['单价'].astype(float)
+            df['销售额'] = df['销售额'].astype(float)
             
             # 生成Excel文件
-            filename = f"medicine_sales_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            filepath = os.path.join(self.reports_folder, filename)
-            
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 # 销售报表
                 df.to_excel(writer, sheet_name='药品销售报表', index=False)
@@ -64,110 +376,192 @@ class ReportGenerator:
                 }
                 summary_df = pd.DataFrame(summary_data)
                 summary_df.to_excel(writer, sheet_name='统计摘要', index=False)
-            
-            return filepath
         except Exception as e:
             print(f"生成药品销售报表时出错: {str(e)}")
             raise
     
-    def generate_appointment_report(self, start_date=None, end_date=None):
-        """生成预约报表"""
+    def _appointment_count_query(self, column, start_date=None, end_date=None):
+        """按某列统计预约数，连接和过滤条件与明细查询一致"""
+        query = db.session.query(column, db.func.count(Appointment.id))\
+            .select_from(Appointment).join(Patient).join(Doctor)
+        query = self._filter_appointment_dates(query, start_date, end_date)
+        return query.group_by(column).order_by(column)
+    
+    def _appointment_frames(self, start_date=None, end_date=None):
+        """预约明细及科室、状态统计，统计由数据库分组计算"""
+        df = self._read_frame(self._appointment_query(start_date, end_date), DETAIL_HEADERS['appointments'])
+        df['预约时间'] = _format_datetimes(df['预约时间'], 'm')
+        df['备注'] = df['备注'].fillna('')
+        dept_stats = self._count_frame(
+            self._appointment_count_query(Doctor.department, start_date, end_date), ['科室', '预约数量'])
+        status_stats = self._count_frame(
+            self._appointment_count_query(Appointment.status, start_date, end_date), ['状态', '数量'])
+        return df, dept_stats, status_stats
+    
+    def _write_appointment_report(self, filepath, start_date=None, end_date=None):
+        import pandas as pd
         try:
-            query = db.session.query(
-                Appointment.id,
-                Patient.name.label('patient_name'),
-                Doctor.name.label('doctor_name'),
-                Doctor.department,
-                Appointment.date,
-                Appointment.status,
-                Appointment.notes
-            ).join(Patient).join(Doctor)
-            
-            if start_date:
-                query = query.filter(Appointment.date >= start_date)
-            if end_date:
-                query = query.filter(Appointment.date <= end_date)
-            
-            # 将查询结果转换为DataFrame
-            results = query.all()
-            data = []
-            for result in results:
-                data.append({
-                    '预约ID': result.id,
-                    '患者姓名': result.patient_name,
-                    '医生姓名': result.doctor_name,
-                    '科室': result.department,
-                    '预约时间': result.date.strftime('%Y-%m-%d %H:%M'),
-                    '状态': result.status,
-                    '备注': result.notes or ''
-                })
-            
-            df = pd.DataFrame(data)
-            
-            filename = f"appointment_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            filepath = os.path.join(self.reports_folder, filename)
+            df, dept_stats, status_stats = self._appointment_frames(start_date, end_date)
             
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 df.to_excel(writer, sheet_name='预约报表', index=False)
                 
-                # 按科室统计
                 if not df.empty:
-                    dept_stats = df.groupby('科室').size().reset_index(name='预约数量')
                     dept_stats.to_excel(writer, sheet_name='科室统计', index=False)
-                    
-                    # 按状态统计
-                    status_stats = df.groupby('状态').size().reset_index(name='数量')
                     status_stats.to_excel(writer, sheet_name='状态统计', index=False)
-            
-            return filepath
         except Exception as e:
             print(f"生成预约报表时出错: {str(e)}")
             raise
     
-    def generate_patient_report(self):
-        """生成患者报表"""
+    def _age_bucket_column(self):
+        """与 AGE_BINS 一致的年龄分段 CASE 表达式"""
+        return db.case(
+            *[(db.and_(Patient.age > lower, Patient.age <= upper), label)
+              for lower, upper, label in zip(AGE_BINS, AGE_BINS[1:], AGE_LABELS)],
+            else_=None
+        )
+    
+    def _patient_frames(self):
+        """患者明细及年龄、性别分布，分布由数据库分组计算"""
+        import pandas as pd
+        df = self._read_frame(self._patient_query(), DETAIL_HEADERS['patients'])
+        df['注册日期'] = _format_datetimes(df['注册日期'], 'D')
+        
+        bucket = self._age_bucket_column()
+        age_counts = dict(db.session.query(bucket, db.func.count(Patient.id))
+                          .filter(bucket.isnot(None)).group_by(bucket).all())
+        age_stats = pd.DataFrame(
+            [(label, age_counts.get(label, 0)) for label in AGE_LABELS], columns=['年龄', '数量'])
+        gender_stats = self._count_frame(
+            db.session.query(Patient.gender, db.func.count(Patient.id))
+            .group_by(Patient.gender).order_by(Patient.gender), ['性别', '数量'])
+        return df, age_stats, gender_stats
+    
+    def _write_patient_report(self, filepath):
+        import pandas as pd
         try:
-            query = db.session.query(
-                Patient.id,
-                Patient.name,
-                Patient.age,
-                Patient.gender,
-                Patient.register_date,
-                db.func.count(Appointment.id).label('appointment_count')
-            ).outerjoin(Appointment)\
-             .group_by(Patient.id, Patient.name, Patient.age, Patient.gender, Patient.register_date)
-            
-            # 将查询结果转换为DataFrame
-            results = query.all()
-            data = []
-            for result in results:
-                data.append({
-                    '患者ID': result.id,
-                    '姓名': result.name,
-                    '年龄': result.age,
-                    '性别': result.gender,
-                    '注册日期': result.register_date.strftime('%Y-%m-%d'),
-                    '预约次数': result.appointment_count
-                })
-            
-            df = pd.DataFrame(data)
-            
-            filename = f"patient_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            filepath = os.path.join(self.reports_folder, filename)
+            df, age_stats, gender_stats = self._patient_frames()
             
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
                 df.to_excel(writer, sheet_name='患者报表', index=False)
                 
-                # 年龄分布
                 if not df.empty:
-                    age_stats = df.groupby(pd.cut(df['年龄'], bins=[0, 18, 30, 50, 70, 100])).size()
-                    age_stats.to_excel(writer, sheet_name='年龄分布')
-                    
-                    # 性别分布
-                    gender_stats = df.groupby('性别').size().reset_index(name='数量')
+                    age_stats.to_excel(writer, sheet_name='年龄分布', index=False)
                     gender_stats.to_excel(writer, sheet_name='性别分布', index=False)
+        except Exception as e:
+            print(f"生成患者报表时出错: {str(e)}")
+            raise
+    
+    # ==================== 流式报表 ====================
+    
+    def _stream_medicine_sales_report(self, filepath):
+        """流式生成药品销售报表，统计摘要由累加器计算"""
+        from openpyxl import Workbook
+        try:
+            workbook = Workbook(write_only=True)
+            sales_sheet = workbook.create_sheet('药品销售报表')
+            stock_sheet = workbook.create_sheet('库存报表')
+            summary_sheet = workbook.create_sheet('统计摘要')
             
-            return filepath
+            sales_sheet.append(list(DETAIL_HEADERS['medicines'].values()))
+            stock_sheet.append(['药品名称', '类别', '库存', '单价', '库存价值'])
+            
+            count, total_stock, total_revenue, total_price = 0, 0, 0.0, 0.0
+            for row in self._iter_rows(self._medicine_sales_query()):
+                price = float(row.price)
+                revenue = float(row.total_revenue)
+                sales_sheet.append([row.name, row.category, price, row.stock, row.total_sold, revenue])
+                stock_sheet.append([row.name, row.category, row.stock, price, (row.stock or 0) * price])
+                count += 1
+                total_stock += row.stock or 0
+                total_revenue += revenue
+                total_price += price
+            
+            summary_sheet.append(['统计项', '数值'])
+            summary_sheet.append(['总药品数', count])
+            summary_sheet.append(['总库存', total_stock])
+            summary_sheet.append(['总销售额', total_revenue])
+            summary_sheet.append(['平均单价', total_price / count if count else None])
+            
+            workbook.save(filepath)
+        except Exception as e:
+            print(f"生成药品销售报表时出错: {str(e)}")
+            raise
+    
+    def _stream_appointment_report(self, filepath, start_date=None, end_date=None):
+        """流式生成预约报表，科室和状态统计由累加器计算"""
+        from openpyxl import Workbook
+        try:
+            workbook = Workbook(write_only=True)
+            detail_sheet = workbook.create_sheet('预约报表')
+            detail_sheet.append(list(DETAIL_HEADERS['appointments'].values()))
+            
+            dept_counts, status_counts = {}, {}
+            for row in self._iter_rows(self._appointment_query(start_date, end_date)):
+                detail_sheet.append([
+                    row.id,
+                    row.patient_name,
+                    row.doctor_name,
+                    row.department,
+                    row.date.strftime('%Y-%m-%d %H:%M'),
+                    row.status,
+                    row.notes or ''
+                ])
+                dept_counts[row.department] = dept_counts.get(row.department, 0) + 1
+                status_counts[row.status] = status_counts.get(row.status, 0) + 1
+            
+            if dept_counts:
+                dept_sheet = workbook.create_sheet('科室统计')
+                dept_sheet.append(['科室', '预约数量'])
+                for department in sorted(dept_counts):
+                    dept_sheet.append([department, dept_counts[department]])
+                
+                status_sheet = workbook.create_sheet('状态统计')
+                status_sheet.append(['状态', '数量'])
+                for status in sorted(status_counts, key=str):
+                    status_sheet.append([status, status_counts[status]])
+            
+            workbook.save(filepath)
+        except Exception as e:
+            print(f"生成预约报表时出错: {str(e)}")
+            raise
+    
+    def _stream_patient_report(self, filepath):
+        """流式生成患者报表，年龄和性别分布由累加器计算"""
+        from openpyxl import Workbook
+        try:
+            workbook = Workbook(write_only=True)
+            detail_sheet = workbook.create_sheet('患者报表')
+            detail_sheet.append(list(DETAIL_HEADERS['patients'].values()))
+            
+            age_counts = dict.fromkeys(AGE_LABELS, 0)
+            gender_counts = {}
+            for row in self._iter_rows(self._patient_query()):
+                detail_sheet.append([
+                    row.id,
+                    row.name,
+                    row.age,
+                    row.gender,
+                    row.register_date.strftime('%Y-%m-%d') if row.register_date else '',
+                    row.appointment_count
+                ])
+                bucket = _age_bucket(row.age)
+                if bucket:
+                    age_counts[bucket] += 1
+                gender_counts[row.gender] = gender_counts.get(row.gender, 0) + 1
+            
+            if gender_counts:
+                age_sheet = workbook.create_sheet('年龄分布')
+                age_sheet.append(['年龄', '数量'])
+                for bucket, count in age_counts.items():
+                    age_sheet.append([bucket, count])
+                
+                gender_sheet = workbook.create_sheet('性别分布')
+                gender_sheet.append(['性别', '数量'])
+                for gender in sorted(gender_counts):
+                    gender_sheet.append([gender, gender_counts[gender]])
+            
+            workbook.save(filepath)
         except Exception as e:
             print(f"生成患者报表时出错: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
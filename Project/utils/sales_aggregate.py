@@ -0,0 +1,139 @@
+from sqlalchemy import event
+from models import db, Medicine, Prescription, MedicineSales
+from utils.cache import mark_changed
+
+sales_table = MedicineSales.__table__
+medicines_table = Medicine.__table__
+
+
+def _price_of(medicine_id):
+    return db.select(medicines_table.c.price)\
+        .where(medicines_table.c.id == medicine_id)\
+        .scalar_subquery()
+
+
+def apply_sales_delta(connection, medicine_id, quantity):
+    """
+    按当前单价增减某药品的销量和销售额。
+
+    在处方写入/删除的同一连接(同一事务)内执行，汇总表与处方表始终一致。
+    汇总行不存在时(新药品首次销售)再插入。
+    """
+    result = connection.execute(
+        sales_table.update()
+        .where(sales_table.c.medicine_id == medicine_id)
+        .values(
+            total_sold=sales_table.c.total_sold + quantity,
+            total_revenue=sales_table.c.total_revenue + quantity * _price_of(medicine_id)
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            sales_table.insert().from_select(
+                ['medicine_id', 'total_sold', 'total_revenue'],
+                db.select(
+                    medicines_table.c.id,
+                    db.literal(quantity),
+                    medicines_table.c.price * quantity
+                ).where(medicines_table.c.id == medicine_id)
+            )
+        )
+
+
+def _mark_sales_changed(target):
+    # 汇总表通过连接直接更新，不在会话的 flush 对象中，需单独记录以更新数据版本
+    mark_changed(db.object_session(target), sales_table.name)
+
+
+def _after_prescription_insert(mapper, connection, target):
+    apply_sales_delta(connection, target.medicine_id, target.quantity)
+    _mark_sales_changed(target)
+
+
+def _after_prescription_delete(mapper, connection, target):
+    apply_sales_delta(connection, target.medicine_id, -target.quantity)
+    _mark_sales_changed(target)
+
+
+def _after_prescription_update(mapper, connection, target):
+    state = db.inspect(target)
+    medicine_history = state.attrs.medicine_id.history
+    quantity_history = state.attrs.quantity.history
+    if not medicine_history.has_changes() and not quantity_history.has_changes():
+        return
+    old_medicine = medicine_history.deleted[0] if medicine_history.deleted else target.medicine_id
+    old_quantity = quantity_history.deleted[0] if quantity_history.deleted else target.quantity
+    apply_sales_delta(connection, old_medicine, -old_quantity)
+    apply_sales_delta(connection, target.medicine_id, target.quantity)
+    _mark_sales_changed(target)
+
+
+def _after_medicine_update(mapper, connection, target):
+    # 销售额按当前单价计算，调价后只需更新该药品一行
+    if db.inspect(target).attrs.price.history.has_changes():
+        connection.execute(
+            sales_table.update()
+            .where(sales_table.c.medicine_id == target.id)
+            .values(total_revenue=sales_table.c.total_sold * _price_of(target.id))
+        )
+        _mark_sales_changed(target)
+
+
+def init_sales_aggregate(app):
+    """注册维护药品销量汇总表的ORM事件"""
+    if event.contains(Prescription, 'after_insert', _after_prescription_insert):
+        return
+    event.listen(Prescription, 'after_insert', _after_prescription_insert)
+    event.listen(Prescription, 'after_delete', _after_prescription_delete)
+    event.listen(Prescription, 'after_update', _after_prescription_update)
+    event.listen(Medicine, 'after_update', _after_medicine_update)
+
+
+def _recomputed_sales():
+    """从处方明细重新计算的销量，作为校验和重建的基准"""
+    return db.select(
+        Medicine.id.label('medicine_id'),
+        db.func.coalesce(db.func.sum(Prescription.quantity), 0).label('total_sold'),
+        db.func.coalesce(db.func.sum(Prescription.quantity * Medicine.price), 0).label('total_revenue')
+    ).outerjoin(Prescription, Medicine.id == Prescription.medicine_id)\
+     .group_by(Medicine.id)
+
+
+def rebuild_medicine_sales():
+    """根据处方明细全量重建汇总表，返回药品数"""
+    db.session.execute(sales_table.delete())
+    recomputed = _recomputed_sales().subquery()
+    result = db.session.execute(
+        sales_table.insert().from_select(
+            ['medicine_id', 'total_sold', 'total_revenue'],
+            db.select(recomputed.c.medicine_id, recomputed.c.total_sold, recomputed.c.total_revenue)
+        )
+    )
+    mark_changed(db.session(), sales_table.name)
+    db.session.commit()
+    return result.rowcount
+
+
+def verify_medicine_sales():
+    """对比汇总表与处方明细，返回不一致的药品列表"""
+    recomputed = _recomputed_sales().subquery()
+    rows = db.session.execute(
+        db.select(
+            recomputed.c.medicine_id,
+            recomputed.c.total_sold,
+            recomputed.c.total_revenue,
+            db.func.coalesce(MedicineSales.total_sold, 0),
+            db.func.coalesce(MedicineSales.total_revenue, 0)
+        ).outerjoin(MedicineSales, MedicineSales.medicine_id == recomputed.c.medicine_id)
+    ).all()
+    mismatches = []
+    for medicine_id, expected_sold, expected_revenue, actual_sold, actual_revenue in rows:
+        if expected_sold != actual_sold or abs(float(expected_revenue) - float(actual_revenue)) > 0.005:
+            mismatches.append({
+                'medicine_id': medicine_id,
+                'expected_sold': expected_sold,
+                'actual_sold': actual_sold,
+                'expected_revenue': float(expected_revenue),
+                'actual_revenue': float(actual_revenue)
+            })
+    return mismatches
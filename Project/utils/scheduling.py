@@ -0,0 +1,189 @@
+import bisect
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from models import db, Doctor, Appointment
+
+doctors_table = Doctor.__table__
+
+# 已取消的预约不占用号源
+RELEASED_STATUSES = ('cancelled',)
+DEFAULT_SEARCH_DAYS = 14
+MAX_SEARCH_DAYS = 90
+MAX_SLOTS = 100
+
+
+def slot_length(doctor):
+    return timedelta(minutes=doctor.slot_minutes or 30)
+
+
+def lock_doctor_schedule(doctor_id):
+    """
+    锁定医生的排班直到事务结束，同一医生的预约写入因此串行执行，随后的冲突检查
+    能看到其他事务已提交的预约。医生不存在时返回 False。
+
+    服务器数据库对医生行加更新锁(SELECT ... FOR UPDATE，SQL Server 为 UPDLOCK 提示)；
+    SQLite 没有行锁且忽略 FOR UPDATE，改为递增 schedule_version 取得数据库写锁
+    (该字段不在全文索引中，不会触发索引同步)。
+    """
+    if db.engine.dialect.name == 'sqlite':
+        result = db.session.execute(
+            doctors_table.update()
+            .where(doctors_table.c.id == doctor_id)
+            .values(schedule_version=doctors_table.c.schedule_version + 1)
+        )
+        return result.rowcount == 1
+    statement = db.select(Doctor.id).where(Doctor.id == doctor_id)\
+        .with_for_update()\
+        .with_hint(Doctor, 'WITH (UPDLOCK, ROWLOCK)', 'mssql')
+    return db.session.execute(statement).first() is not None
+
+
+def find_conflict(doctor, start, exclude_id=None):
+    """
+    返回与 [start, start + 号源时长) 重叠的有效预约，没有则返回 None。
+
+    同一医生的预约时长相同，重叠即开始时间落在 (start - 时长, start + 时长) 内，
+    可直接用 (doctor_id, date) 索引做范围查询。
+    """
+    length = slot_length(doctor)
+    query = Appointment.query.filter(
+        Appointment.doctor_id == doctor.id,
+        Appointment.date > start - length,
+        Appointment.date < start + length,
+        Appointment.status.notin_(RELEASED_STATUSES)
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+    return query.order_by(Appointment.date).first()
+
+
+class BookedIntervals:
+    """某医生在查询窗口内已占用的时段：按开始时间排序，二分查找判断是否重叠"""
+
+    def __init__(self, length):
+        self.length = length
+        self.starts = []
+
+    def overlaps(self, start, end):
+        # 时长相同，只需检查开始时间早于 end 的最后一个预约
+        index = bisect.bisect_left(self.starts, end)
+        return index > 0 and self.starts[index - 1] + self.length > start
+
+
+def load_booked_intervals(doctors, window_start, window_end):
+    """一次查询取出各医生在窗口内的有效预约，返回 {doctor_id: BookedIntervals}"""
+    intervals = {doctor.id: BookedIntervals(slot_length(doctor)) for doctor in doctors}
+    if not intervals:
+        return intervals
+    longest = max(interval.length for interval in intervals.values())
+    rows = db.session.execute(
+        db.select(Appointment.doctor_id, Appointment.date)
+        .where(
+            Appointment.doctor_id.in_(list(intervals)),
+            Appointment.date > window_start - longest,
+            Appointment.date < window_end,
+            Appointment.status.notin_(RELEASED_STATUSES)
+        )
+        .order_by(Appointment.doctor_id, Appointment.date)
+    )
+    for doctor_id, date in rows:
+        intervals[doctor_id].starts.append(date)
+    return intervals
+
+
+def _work_days(doctor):
+    return {int(day) for day in (doctor.work_days or '') if day.isdigit()}
+
+
+def iter_free_slots(doctor, booked, window_start, window_end):
+    """按时间顺序逐个生成医生在窗口内的空闲号源开始时间"""
+    length = slot_length(doctor)
+    work_days = _work_days(doctor)
+    day = window_start.date()
+    while datetime.combine(day, doctor.work_start) < window_end:
+        if day.isoweekday() in work_days:
+            slot = datetime.combine(day, doctor.work_start)
+            day_end = datetime.combine(day, doctor.work_end)
+            if slot < window_start:
+                # 跳到窗口开始后的第一个号源
+                slot += -((slot - window_start) // length) * length
+            while slot + length <= day_end and slot < window_end:
+                if not booked.overlaps(slot, slot + length):
+                    yield slot
+                slot += length
+        day += timedelta(days=1)
+
+
+def _tagged_slots(doctor, booked, window_start, window_end):
+    # 归并时按 (时间, 医生ID) 排序
+    for slot in iter_free_slots(doctor, booked, window_start, window_end):
+        yield slot, doctor.id, doctor
+
+
+def next_free_slots(doctors, window_start, days=DEFAULT_SEARCH_DAYS, limit=10):
+    """
+    多位医生在 [window_start, window_start + days) 内最早的 limit 个空闲号源。
+
+    已占用时段只查询窗口内的预约(走 (doctor_id, date) 索引)，各医生的空闲号源
+    按时间归并，取够 limit 个即停止，耗时与窗口内预约数和 limit 相关，与总预约数无关。
+    """
+    window_end = window_start + timedelta(days=days)
+    booked = load_booked_intervals(doctors, window_start, window_end)
+    streams = [_tagged_slots(doctor, booked[doctor.id], window_start, window_end) for doctor in doctors]
+    merged = heapq.merge(*streams, key=lambda item: item[:2])
+    return [
+        {
+            'doctor_id': doctor.id,
+            'doctor_name': doctor.name,
+            'department': doctor.department,
+            'start': slot.strftime('%Y-%m-%d %H:%M'),
+            'end': (slot + slot_length(doctor)).strftime('%Y-%m-%d %H:%M'),
+        }
+        for slot, _, doctor in itertools.islice(merged, limit)
+    ]
+
+
+def parse_schedule(data, doctor=None):
+    """从请求数据中解析排班字段，只返回提供了的字段；格式错误时抛出 ValueError
+
+    只提供上班或下班时间之一时，与 doctor 现有的值(新建医生为默认值)比较
+    """
+    fields = {}
+    if data.get('slot_minutes') not in (None, ''):
+        slot_minutes = int(data['slot_minutes'])
+        if not 5 <= slot_minutes <= 240:
+            raise ValueError('号源时长应在5到240分钟之间')
+        fields['slot_minutes'] = slot_minutes
+    for name in ('work_start', 'work_end'):
+        if data.get(name):
+            fields[name] = datetime.strptime(data[name], '%H:%M').time()
+    work_start = fields.get('work_start') or _current_schedule(doctor, 'work_start')
+    work_end = fields.get('work_end') or _current_schedule(doctor, 'work_end')
+    if work_end <= work_start:
+        raise ValueError('下班时间应晚于上班时间')
+    if data.get('work_days') is not None:
+        work_days = ''.join(sorted(set(str(data['work_days']))))
+        if not work_days or not set(work_days) <= set('1234567'):
+            raise ValueError('出诊日应为1-7的数字组合(1=周一)')
+        fields['work_days'] = work_days
+    return fields
+
+
+def _current_schedule(doctor, name):
+    if doctor is not None and getattr(doctor, name) is not None:
+        return getattr(doctor, name)
+    return doctors_table.c[name].default.arg
+
+
+def parse_slot_start(value, now=None):
+    """查询窗口开始时间：支持 YYYY-MM-DD 或 YYYY-MM-DD HH:MM，不早于当前时间"""
+    now = now or datetime.now()
+    if not value:
+        return now
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return max(datetime.strptime(value, fmt), now)
+        except ValueError:
+            continue
+    raise ValueError('开始时间格式应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM')
@@ -3,10 +3,25 @@
 """
 系统设计图生成模块
 使用diagrams库生成各种系统设计图
+
+每张图由一份纯数据描述(标题、方向、分组节点、连线)定义，输出文件名带描述的内容哈希：
+描述不变时直接返回已有图片，需要渲染的图在进程内共用的进程池中并行生成。
+ER图由 SQLAlchemy 元数据推导，只有表、字段或外键变化时才会重新渲染。
+
+命令行用法(在项目目录下): python -m utils.system_diagrams
 """
 
+import contextlib
+import hashlib
+import json
+import multiprocessing
 import os
-import sys
+import re
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.metadata import version
 
 # 确保能正确导入diagrams库
 try:
@@ -17,142 +32,241 @@ try:
     from diagrams.programming.framework import Flask
     from diagrams.programming.language import Python
 except ImportError as e:
-    print(f"导入diagrams库失败: {e}")
-    print("请确保已安装diagrams库: pip install diagrams")
-    sys.exit(1)
+    # 由调用方决定如何处理(Web路由返回503，命令行打印提示)
+    raise ImportError(f"导入diagrams库失败: {e}，请确保已安装diagrams库: pip install diagrams") from e
 
+# 渲染逻辑变化时修改，使所有缓存的图片失效
+RENDER_VERSION = 1
 
-def generate_er_diagram():
-    """生成ER图，展示5张表的关系"""
-    try:
-        with Diagram("医疗平台ER图", show=False, direction="TB", filename="er_diagram"):
-            # 定义节点
-            patient = SQL("患者表\n(Patient)")
-            doctor = SQL("医生表\n(Doctor)")
-            appointment = SQL("预约表\n(Appointment)")
-            medicine = SQL("药品表\n(Medicine)")
-            prescription = SQL("处方表\n(Prescription)")
-
-            # 定义关系
-            patient >> appointment
-            doctor >> appointment
-            appointment >> prescription
-            medicine >> prescription
-
-        return "ER图生成完成，文件保存为: er_diagram.png"
-    except Exception as e:
-        return f"ER图生成失败: {str(e)}"
+_pool = None
+_pool_lock = threading.Lock()
 
+NODE_TYPES = {
+    'SQL': SQL,
+    'Storage': Storage,
+    'Client': Client,
+    'Flask': Flask,
+    'Python': Python,
+}
 
-def generate_appointment_activity():
-    """生成预约流程活动图"""
-    try:
-        with Diagram("预约流程活动图", show=False, direction="LR", filename="appointment_activity"):
-            # 定义活动节点
-            start = Client("开始")
-            register = Storage("患者注册")
-            search = Storage("查找医生")
-            book = Storage("预约挂号")
-            confirm = Storage("确认预约")
-            visit = Storage("就诊")
-            end = Client("结束")
-
-            # 定义流程
-            start >> register >> search >> book >> confirm >> visit >> end
-
-        return "预约流程活动图生成完成，文件保存为: appointment_activity.png"
-    except Exception as e:
-        return f"预约流程活动图生成失败: {str(e)}"
+# 图名称(输出文件名前缀) -> 显示名称
+DIAGRAMS = [
+    ('er_diagram', 'ER图'),
+    ('appointment_activity', '预约流程活动图'),
+    ('prescription_sequence', '处方开具顺序图'),
+    ('system_architecture', '系统架构图'),
+]
 
+# 描述格式: groups 为 [(分组名或None, [(节点ID, 节点类型, 标签), ...]), ...]，edges 为 [(起点ID, 终点ID), ...]
+APPOINTMENT_ACTIVITY = {
+    'title': '预约流程活动图',
+    'direction': 'LR',
+    'groups': [
+        (None, [
+            ('start', 'Client', '开始'),
+            ('register', 'Storage', '患者注册'),
+            ('search', 'Storage', '查找医生'),
+            ('book', 'Storage', '预约挂号'),
+            ('confirm', 'Storage', '确认预约'),
+            ('visit', 'Storage', '就诊'),
+            ('end', 'Client', '结束'),
+        ]),
+    ],
+    'edges': [
+        ('start', 'register'), ('register', 'search'), ('search', 'book'),
+        ('book', 'confirm'), ('confirm', 'visit'), ('visit', 'end'),
+    ],
+}
+
+PRESCRIPTION_SEQUENCE = {
+    'title': '处方开具顺序图',
+    'direction': 'TB',
+    'groups': [
+        ('医疗流程', [
+            ('patient', 'Client', '患者'),
+            ('doctor', 'Flask', '医生'),
+            ('pharmacy', 'Storage', '药房'),
+            ('system', 'SQL', '系统'),
+        ]),
+    ],
+    'edges': [('patient', 'doctor'), ('doctor', 'system'), ('system', 'pharmacy'), ('pharmacy', 'patient')],
+}
+
+SYSTEM_ARCHITECTURE = {
+    'title': '医疗平台系统架构',
+    'direction': 'TB',
+    'groups': [
+        ('前端', [('web', 'Client', 'Web客户端'), ('mobile', 'Client', '移动端')]),
+        ('后端服务', [('flask', 'Flask', 'Flask应用'), ('api', 'Python', 'API服务')]),
+        ('数据层', [('db', 'SQL', '数据库'), ('cache', 'Storage', '缓存')]),
+    ],
+    'edges': [('web', 'flask'), ('mobile', 'flask'), ('flask', 'api'), ('api', 'db'), ('api', 'cache')],
+}
+
+
+def er_diagram_spec(model_base):
+    """由模型元数据生成ER图描述：每张表一个节点(含字段和类型)，每个外键一条连线"""
+    titles = {}
+    for mapper in model_base.registry.mappers:
+        doc = (mapper.class_.__doc__ or '').split(' - ')[0].strip()
+        name = mapper.class_.__name__
+        titles[mapper.local_table.name] = f"{doc}\n({name})" if doc else name
+
+    nodes, edges = [], set()
+    for table in model_base.metadata.sorted_tables:
+        columns = '\n'.join(f"{column.name}: {column.type}" for column in table.columns)
+        nodes.append((table.name, 'SQL', f"{titles.get(table.name, table.name)}\n\n{columns}"))
+        for foreign_key in table.foreign_keys:
+            edges.add((foreign_key.column.table.name, table.name))
+    return {
+        'title': '医疗平台ER图',
+        'direction': 'TB',
+        'groups': [(None, nodes)],
+        'edges': sorted(edges),
+    }
+
+
+def diagram_specs(model_base):
+    """所有图的描述，按 DIAGRAMS 的顺序"""
+    return {
+        'er_diagram': er_diagram_spec(model_base),
+        'appointment_activity': APPOINTMENT_ACTIVITY,
+        'prescription_sequence': PRESCRIPTION_SEQUENCE,
+        'system_architecture': SYSTEM_ARCHITECTURE,
+    }
+
+
+def spec_hash(spec):
+    """描述的内容哈希，包含渲染版本和diagrams库版本"""
+    payload = json.dumps([RENDER_VERSION, version('diagrams'), spec], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def render_diagram(spec, path):
+    """按描述渲染一张PNG，path 不含扩展名"""
+    with Diagram(spec['title'], show=False, direction=spec['direction'], filename=path, outformat='png'):
+        nodes = {}
+        for cluster, members in spec['groups']:
+            with Cluster(cluster) if cluster else contextlib.nullcontext():
+                for node_id, node_type, label in members:
+                    nodes[node_id] = NODE_TYPES[node_type](label)
+        for source, target in spec['edges']:
+            nodes[source] >> nodes[target]
+    return path + '.png'
 
-def generate_prescription_sequence():
-    """生成处方开具顺序图"""
-    try:
-        with Diagram("处方开具顺序图", show=False, direction="TB", filename="prescription_sequence"):
-            with Cluster("医疗流程"):
-                patient = Client("患者")
-                doctor = Flask("医生")
-                pharmacy = Storage("药房")
-                system = SQL("系统")
-
-                # 定义交互顺序
-                patient >> doctor
-                doctor >> system
-                system >> pharmacy
-                pharmacy >> patient
-
-        return "处方开具顺序图生成完成，文件保存为: prescription_sequence.png"
-    except Exception as e:
-        return f"处方开具顺序图生成失败: {str(e)}"
 
+class RenderError(Exception):
+    """渲染失败，只携带原始错误信息"""
 
-def generate_system_architecture():
-    """生成系统架构图"""
+
+def _render_to(spec, output_dir, filename):
+    """进程池任务：先写临时文件再改名，并发请求不会读到写了一半的图片"""
+    temp_path = os.path.join(output_dir, f".{uuid.uuid4().hex}")
     try:
-        with Diagram("医疗平台系统架构", show=False, direction="TB", filename="system_architecture"):
-            with Cluster("前端"):
-                web = Client("Web客户端")
-                mobile = Client("移动端")
-
-            with Cluster("后端服务"):
-                flask = Flask("Flask应用")
-                api = Python("API服务")
-
-            with Cluster("数据层"):
-                db = SQL("数据库")
-                cache = Storage("缓存")
-
-            # 连接关系
-            web >> flask
-            mobile >> flask
-            flask >> api
-            api >> db
-            api >> cache
-
-        return "系统架构图生成完成，文件保存为: system_architecture.png"
+        os.replace(render_diagram(spec, temp_path), os.path.join(output_dir, filename))
     except Exception as e:
-        return f"系统架构图生成失败: {str(e)}"
+        # graphviz 等库的异常构造参数与 args 不一致，跨进程反序列化后信息会错乱，只传回文本
+        raise RenderError(f"{type(e).__name__}: {e}") from None
+    finally:
+        for leftover in (temp_path, temp_path + '.png'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(leftover)
+
+
+def _prune(output_dir, name, keep):
+    """删除同一张图的旧版本"""
+    pattern = re.compile(rf'{re.escape(name)}_[0-9a-f]{{16}}\.png$')
+    for file in os.listdir(output_dir):
+        if file != keep and pattern.match(file):
+            os.remove(os.path.join(output_dir, file))
+
+
+def _get_pool(max_workers):
+    """
+    进程内共用的渲染进程池，首次使用时创建。
+
+    使用 spawn 启动工作进程：Web服务是多线程的，fork 会把其他线程持有的锁一并复制到子进程。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    """工作进程异常退出后进程池不可再用，丢弃后下次重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
 
+def render_diagrams(specs, output_dir='diagrams', max_workers=4):
+    """
+    渲染一组图，返回 {名称: {'file', 'cached', 'error'}}。
 
-def generate_all_diagrams():
+    输出文件为 <名称>_<内容哈希>.png，已存在则直接返回；
+    其余的图在共用进程池中并行渲染(diagrams 用全局上下文记录当前图，不适合多线程)，
+    max_workers 只在首次创建进程池时生效。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results, pending = {}, {}
+    for name, spec in specs.items():
+        filename = f"{name}_{spec_hash(spec)}.png"
+        if os.path.exists(os.path.join(output_dir, filename)):
+            results[name] = {'file': filename, 'cached': True, 'error': None}
+        else:
+            pending[name] = filename
+
+    if pending:
+        pool = _get_pool(max_workers)
+        futures = {}
+        for name, filename in pending.items():
+            try:
+                futures[name] = pool.submit(_render_to, specs[name], output_dir, filename)
+            except BrokenProcessPool as e:
+                _discard_pool(pool)
+                results[name] = {'file': None, 'cached': False, 'error': f"渲染进程异常退出: {e}"}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except BrokenProcessPool as e:
+                _discard_pool(pool)
+                results[name] = {'file': None, 'cached': False, 'error': f"渲染进程异常退出: {e}"}
+                continue
+            except Exception as e:
+                results[name] = {'file': None, 'cached': False, 'error': str(e)}
+                continue
+            _prune(output_dir, name, pending[name])
+            results[name] = {'file': pending[name], 'cached': False, 'error': None}
+
+    return {name: results[name] for name in specs}
+
+
+def generate_all_diagrams(output_dir='diagrams'):
     """生成所有图表"""
-    results = []
-    
+    from models import db
+
     print("开始生成系统设计图...")
-    
-    # 生成ER图
-    print("1. 生成ER图...")
-    result = generate_er_diagram()
-    results.append(result)
-    print(result)
-    
-    # 生成预约流程活动图
-    print("2. 生成预约流程活动图...")
-    result = generate_appointment_activity()
-    results.append(result)
-    print(result)
-    
-    # 生成处方开具顺序图
-    print("3. 生成处方开具顺序图...")
-    result = generate_prescription_sequence()
-    results.append(result)
-    print(result)
-    
-    # 生成系统架构图
-    print("4. 生成系统架构图...")
-    result = generate_system_architecture()
-    results.append(result)
-    print(result)
-    
+    outcomes = render_diagrams(diagram_specs(db.Model), output_dir)
+
+    results = []
+    for index, (name, label) in enumerate(DIAGRAMS, 1):
+        outcome = outcomes[name]
+        if outcome['error']:
+            result = f"{label}生成失败: {outcome['error']}"
+        else:
+            state = '未变化，使用缓存' if outcome['cached'] else '生成完成'
+            result = f"{label}{state}，文件保存为: {os.path.join(output_dir, outcome['file'])}"
+        results.append(result)
+        print(f"{index}. {result}")
+
     print("\n所有图表生成完成！")
-    print("生成的文件保存在当前目录:")
-    for file in os.listdir('.'):
-        if file.endswith('.png') and 'diagram' in file.lower():
-            print(f"  - {file}")
-    
     return results
 
 
 if __name__ == "__main__":
     # 生成所有图表
-    generate_all_diagrams() 
\ No newline at end of file
+    generate_all_diagrams()